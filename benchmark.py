@@ -0,0 +1,524 @@
+"""
+Benchmark pdf_converter.py on synthetic statements, W-2s and invoice registers.
+
+The PDFs are generated offline (no sample documents are needed) in the
+layouts the parsers accept, at 1, 10, 100 and 1000 pages by default. Each
+parser/size runs in its own process so that peak memory is measured per run.
+
+    python benchmark.py                          # write benchmark_results.json
+    python benchmark.py --pages 10 100 --parsers amex w2
+    python benchmark.py --compare old.json       # flag regressions against an earlier run
+    python benchmark.py --startup                # startup times and the import budget
+    python benchmark.py --check-duplicates       # duplicate files across runs keep their rows
+
+Timings on a busy machine are noisy; --repeat N keeps the fastest of N runs.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PARSERS = ['amex', 'chase', 'w2', 'invoice']
+DEFAULT_PAGES = [1, 10, 100, 1000]
+DEFAULT_THRESHOLD = 0.10  # Flag runs that are more than 10% slower (or bigger) than the baseline
+RESULTS_VERSION = 1
+
+# Importing pdf_converter must take less than this, and must not load any of
+# HEAVY_MODULES: they are imported when a stage first needs them
+DEFAULT_IMPORT_BUDGET = 0.15  # seconds
+HEAVY_MODULES = ['pdfplumber', 'pdfminer', 'pandas', 'numpy', 'pytesseract', 'PIL', 'pyarrow', 'openpyxl']
+
+CARDHOLDERS = ['LUIS RODRIGUEZ', 'ISABEL RODRIGUEZ', 'GABRIEL TRUJILLO', 'PULAK UNG']
+MERCHANTS = [
+    'TST* BLUE BOTTLE SAN FRANCISCO CA',
+    'UNITED AIRLINES 0162312345678 HOUSTON',
+    'SQ *PHILZ COFFEE Daly City CA',
+    'AMAZON.COM*2K4 AMZN.COM/BILL WA',
+    'SAFEWAY #1234 Oakland CA',
+    'SPO*TACOS EL GORDO Las Vegas NV',
+    'COSTCO WHSE 0423 San Jose',
+    'HOME DEPOT 650-555-1234 SAN MATEO',
+]
+EMPLOYEES = ['Maria Lopez', 'John Smith', 'Ana Garcia']
+
+
+# Synthetic PDFs ------------------------------------------------------------
+
+def _pdf_string(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages, font_size=9):
+    """Write a minimal PDF; each page is a list of (x, y, text) in Helvetica."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for items in pages:
+        content = ''.join(f"BT /F1 {font_size} Tf 1 0 0 1 {x} {y} Tm ({_pdf_string(text)}) Tj ET\n"
+                          for x, y, text in items).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>".encode())
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _text_lines(lines, x=40, top=760, step=12):
+    return [(x, top - i * step, line) for i, line in enumerate(lines)]
+
+
+def _amount(rng):
+    return f"{rng.randint(1, 3000):,}.{rng.randint(0, 99):02d}"
+
+
+def amex_pages(count, rng):
+    """Cardholder headers, MM/DD and MM/DD/YY transactions, and a notices page now and then."""
+    pages = []
+    for page_num in range(count):
+        if page_num % 7 == 5:
+            pages.append(_text_lines(["Important Notices", "01/15 Terms and conditions apply effective."]))
+            continue
+        lines = [f"Account Summary page {page_num + 1}"]
+        if page_num % 3 == 0:
+            lines.append(rng.choice(CARDHOLDERS))
+        for i in range(40):
+            date = f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}"
+            if i % 5:
+                lines.append(f"{date} {rng.choice(MERCHANTS)} ${_amount(rng)}")
+            else:
+                lines.append(f"{date}/24 {rng.choice(MERCHANTS)} {_amount(rng)}")
+        pages.append(_text_lines(lines))
+    return pages
+
+
+def chase_pages(count, rng):
+    """Cardholder names above "Account Number" lines, with card-type prefixes and credits."""
+    pages = []
+    for page_num in range(count):
+        lines = []
+        if page_num % 2 == 0:
+            lines += [rng.choice(CARDHOLDERS), "Account Number: XXXX 1234"]
+        for i in range(40):
+            prefix = rng.choice(['', '& ', '8 '])
+            sign = '-' if i % 9 == 0 else ''
+            lines.append(f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d} {prefix}{rng.choice(MERCHANTS)} "
+                         f"{sign}{_amount(rng)}")
+        pages.append(_text_lines(lines))
+    return pages
+
+
+def w2_pages(count, rng):
+    """Two W-2 forms per page, with the box labels above their values."""
+    pages = []
+    for _ in range(count):
+        items = []
+        for form in range(2):
+            y = 760 - form * 380
+            ssn = f"{rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}"
+            wages = rng.randint(20000, 90000)
+            items += [
+                (40, y, "a Employee's social security number"), (40, y - 12, ssn),
+                (40, y - 30, "b Employer identification number (EIN)"),
+                (250, y - 30, "1 Wages, tips, other compensation"), (430, y - 30, "2 Federal income tax withheld"),
+                (40, y - 42, "84-4552796"), (250, y - 42, f"{wages:.2f}"), (430, y - 42, f"{wages // 9:.2f}"),
+                (40, y - 60, "c Employer's name, address, and ZIP code"),
+                (250, y - 60, "5 Medicare wages and tips"), (430, y - 60, "6 Medicare tax withheld"),
+                (40, y - 72, "Ocomar Enterprises LLC"), (250, y - 72, f"{wages:.2f}"),
+                (430, y - 72, f"{wages * 0.0145:.2f}"),
+                (40, y - 100, "e Employee's first name and initial Last name"),
+                (40, y - 112, rng.choice(EMPLOYEES)),
+                (40, y - 140, "State income tax"), (40, y - 152, f"{wages // 30:.2f}"),
+                (40, y - 170, f"CA SDI {wages * 0.009:.2f}"),
+            ]
+        pages.append(items)
+    return pages
+
+
+def invoice_pages(count, rng):
+    """One invoice register: a header on every page and 45 invoice lines per page."""
+    pages = []
+    for page_num in range(count):
+        lines = ["OCOMAR FOODS INVOICE REGISTER",
+                 "BUSINESS DATE: 01/02/24  PRINT DATE: 01/03/24",
+                 "INV CUSTOMER (ID) PRODUCT MISC FRT : SUBTOTAL : TOTAL"]
+        for i in range(45):
+            amount = rng.randint(10, 9000) + rng.randint(0, 99) / 100
+            lines.append(f"{page_num * 100 + i} CUSTOMER {rng.choice('ABCDEFG')} INC ({rng.randint(100, 999)}) "
+                         f"{amount:,.2f} 0.00 : {amount:,.2f} : {amount:,.2f}")
+        lines.append("ORDERS PREVIOUSLY CONFIRMED 12")
+        pages.append(_text_lines(lines, step=15))
+    return pages
+
+
+PAGE_GENERATORS = {'amex': amex_pages, 'chase': chase_pages, 'w2': w2_pages, 'invoice': invoice_pages}
+
+
+def corpus_pdf(corpus_dir, parser, pages):
+    """Path of the synthetic PDF for a parser and page count, generating it if needed."""
+    path = os.path.join(corpus_dir, f'{parser}_{pages}.pdf')
+    if not os.path.exists(path):
+        # Seeded per document so every run benchmarks the same bytes
+        write_pdf(path, PAGE_GENERATORS[parser](pages, random.Random(f'{parser}:{pages}')))
+    return path
+
+
+# Measuring one run ---------------------------------------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where it can't be measured)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_one(parser, pdf_path, w2_mode, text_backend='pdfplumber'):
+    """Benchmark one parser on one PDF in this process; returns the result dict.
+
+    Stages: import (loading pdf_converter), extract (reading every page
+    into a fresh page cache), parse (the parser on the cached pages) and
+    write (merging the rows and saving the workbook).
+    """
+    stages = {}
+    start = time.perf_counter()
+    import pdf_converter
+    stages['import'] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory(prefix='pdf_benchmark_') as work_dir:
+        converter = pdf_converter.SimplePDFConverter(use_cache=False, w2_mode=w2_mode,
+                                                     text_backends={parser: text_backend})
+        converter.output_dir = work_dir
+        converter.page_cache = pdf_converter.PageTextCache(os.path.join(work_dir, 'cache'), max_bytes=2 ** 40)
+
+        start = time.perf_counter()
+        with converter._open_pdf(pdf_path, parser) as doc:
+            pages = doc.page_count
+            for page_num in range(pages):
+                if parser == 'w2' and w2_mode == 'layout':
+                    doc.page_words(page_num)
+                else:
+                    doc.page_text(page_num)
+        stages['extract'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        converter._pending_reports = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = getattr(converter, f'parse_{parser}_pdf')(pdf_path)
+        stages['parse'] = time.perf_counter() - start
+
+        if parser == 'invoice':
+            rows = sum(invoice['Line Items Count'] for invoice in result)
+        else:
+            rows = len(result)
+        validation_errors = sum(len(errors) for _, errors, _ in converter._pending_reports)
+
+        start = time.perf_counter()
+        outcome = {'result': result, 'error': None, 'reports': [], 'output': '',
+                   'counters': {}, 'merchants': {}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            converter._write_subdir_output(parser, [(os.path.basename(pdf_path), pdf_path)],
+                                           {pdf_path: lambda: outcome})
+        stages['write'] = time.perf_counter() - start
+
+    convert_time = stages['extract'] + stages['parse']
+    return {
+        'parser': parser,
+        'pages': pages,
+        'rows': rows,
+        'validation_errors': validation_errors,
+        'stages': {name: round(seconds, 4) for name, seconds in stages.items()},
+        'total_seconds': round(sum(stages.values()), 4),
+        'pages_per_sec': round(pages / convert_time, 2) if convert_time else None,
+        'rows_per_sec': round(rows / convert_time, 2) if convert_time else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_in_subprocess(parser, pdf_path, w2_mode, text_backend):
+    """Run one benchmark in a fresh interpreter so its peak RSS is its own."""
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', parser, pdf_path,
+               '--w2-mode', w2_mode, '--text-backend', text_backend]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{parser} benchmark failed:\n{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+# Startup -------------------------------------------------------------------
+
+def measure_import():
+    """Import pdf_converter in a fresh interpreter; returns (seconds, heavy modules it loaded)."""
+    code = ("import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            "import pdf_converter\n"
+            "seconds = time.perf_counter() - start\n"
+            f"heavy = sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))\n"
+            "print(json.dumps([seconds, heavy]))")
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"importing pdf_converter failed:\n{completed.stderr.strip()}")
+    seconds, heavy = json.loads(completed.stdout)
+    return seconds, heavy
+
+
+def measure_cli(work_dir, *args):
+    """Wall time of one `pdf_converter.py args` run on the Convert/ folder in work_dir."""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.join(work_dir, 'pdf_converter.py'), *args],
+                               capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"pdf_converter.py {' '.join(args)} failed:\n{completed.stderr.strip()}")
+    return seconds
+
+
+def run_startup(repeat):
+    """Time importing the converter and whole runs that do little work; keeps the fastest of repeat."""
+    results = {}
+    imports = [measure_import() for _ in range(repeat)]
+    results['import_seconds'], results['heavy_modules'] = min(imports)
+    with tempfile.TemporaryDirectory(prefix='pdf_startup_') as work_dir:
+        # The converter works on the Convert/ and Excel/ folders next to the script
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf_converter.py'), work_dir)
+        results['empty_run_seconds'] = min(measure_cli(work_dir, '--no-cache') for _ in range(repeat))
+
+        os.makedirs(os.path.join(work_dir, 'Convert', 'w2'), exist_ok=True)
+        corpus_pdf(os.path.join(work_dir, 'Convert', 'w2'), 'w2', 1)
+        results['one_w2_seconds'] = min(measure_cli(work_dir, '--no-cache') for _ in range(repeat))
+        measure_cli(work_dir, '--incremental')
+        results['one_w2_unchanged_seconds'] = min(measure_cli(work_dir, '--incremental') for _ in range(repeat))
+    return {name: round(value, 4) if isinstance(value, float) else value for name, value in results.items()}
+
+
+def check_startup(startup, import_budget):
+    """List the ways startup results break the import budget, as human-readable strings."""
+    problems = []
+    if startup['heavy_modules']:
+        problems.append(f"importing pdf_converter loads {', '.join(startup['heavy_modules'])}")
+    if startup['import_seconds'] > import_budget:
+        problems.append(f"importing pdf_converter takes {startup['import_seconds']:.3f}s "
+                        f"(budget {import_budget:.3f}s)")
+    return problems
+
+
+# Duplicate files across runs ------------------------------------------------
+
+def current_transactions(work_dir):
+    """Transactions of the current sources in work_dir's ledger, per folder."""
+    with contextlib.closing(sqlite3.connect(os.path.join(work_dir, 'Excel', 'ledger.sqlite'))) as connection:
+        return dict(connection.execute('SELECT folder, COUNT(*) FROM transactions '
+                                       'JOIN sources ON sources.id = transactions.source_id '
+                                       'WHERE sources.position IS NOT NULL GROUP BY folder'))
+
+
+def run_duplicate_check(*args):
+    """Convert a statement in other/, then again with a byte-identical copy of it added to amex/.
+    
+    The second run must skip one copy and keep every transaction, where
+    the first run put them. Returns the problems found, as human-readable
+    strings.
+    """
+    problems = []
+    with tempfile.TemporaryDirectory(prefix='pdf_duplicates_') as work_dir:
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdf_converter.py'), work_dir)
+        for subdir in ('amex', 'other'):
+            os.makedirs(os.path.join(work_dir, 'Convert', subdir))
+        statement = os.path.join(work_dir, 'Convert', 'other', 'statement.pdf')
+        write_pdf(statement, amex_pages(10, random.Random('duplicates')))
+        measure_cli(work_dir, '--no-cache', *args)
+        first = current_transactions(work_dir)
+        if not first.get('other'):
+            return ["the first run kept no transactions from other/statement.pdf"]
+
+        shutil.copy(statement, os.path.join(work_dir, 'Convert', 'amex', 'statement_copy.pdf'))
+        measure_cli(work_dir, '--no-cache', *args)
+        second = current_transactions(work_dir)
+        if second != first:
+            problems.append(f"transactions per folder went from {first} to {second} "
+                            f"when an identical copy was added")
+        if os.path.exists(os.path.join(work_dir, 'Excel', 'amex.xlsx')):
+            problems.append("amex.xlsx was written for a copy of a statement in other/")
+    return problems
+
+
+# Comparing runs ------------------------------------------------------------
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """List regressions of current vs baseline results as human-readable strings.
+
+    A run regresses when its pages/sec drops, or its peak RSS grows, by more
+    than threshold (a fraction). Runs missing from either side are skipped.
+    """
+    baseline_runs = {(run['parser'], run['pages']): run for run in baseline['results']}
+    regressions = []
+    for run in current['results']:
+        old = baseline_runs.get((run['parser'], run['pages']))
+        if old is None:
+            continue
+        name = f"{run['parser']} {run['pages']}p"
+        if old['pages_per_sec'] and run['pages_per_sec'] is not None:
+            if run['pages_per_sec'] < old['pages_per_sec'] * (1 - threshold):
+                regressions.append(f"{name}: {run['pages_per_sec']} pages/sec vs {old['pages_per_sec']} "
+                                   f"({run['pages_per_sec'] / old['pages_per_sec'] - 1:+.0%})")
+        if old['peak_rss_mb'] and run['peak_rss_mb'] is not None:
+            if run['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+                regressions.append(f"{name}: peak RSS {run['peak_rss_mb']} MB vs {old['peak_rss_mb']} MB "
+                                   f"({run['peak_rss_mb'] / old['peak_rss_mb'] - 1:+.0%})")
+        if run['rows'] != old['rows']:
+            regressions.append(f"{name}: {run['rows']} rows vs {old['rows']} in the baseline")
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'parser':<8} {'pages':>6} {'rows':>7} {'pages/s':>9} {'rows/s':>10} "
+          f"{'extract':>8} {'parse':>8} {'write':>8} {'RSS MB':>8}")
+    for run in results:
+        stages = run['stages']
+        rss = run['peak_rss_mb'] if run['peak_rss_mb'] is not None else '-'
+        print(f"{run['parser']:<8} {run['pages']:>6} {run['rows']:>7} {run['pages_per_sec']:>9} "
+              f"{run['rows_per_sec']:>10} {stages['extract']:>8.2f} {stages['parse']:>8.2f} "
+              f"{stages['write']:>8.2f} {rss:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF parsers on generated PDFs.")
+    parser.add_argument('--parsers', nargs='+', choices=PARSERS, default=PARSERS,
+                        help="parsers to benchmark (default: all)")
+    parser.add_argument('--pages', nargs='+', type=int, default=DEFAULT_PAGES, metavar='N',
+                        help="document sizes in pages (default: 1 10 100 1000)")
+    parser.add_argument('--w2-mode', choices=['text', 'layout'], default='text',
+                        help="W-2 parsing mode to benchmark (default: text)")
+    parser.add_argument('--text-backend', choices=['pdfplumber', 'pdfminer'], default='pdfplumber',
+                        help="page text extraction backend to benchmark (default: pdfplumber)")
+    parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                        help="run each benchmark N times and keep the fastest (default: 1)")
+    parser.add_argument('--corpus', metavar='DIR',
+                        help="keep the generated PDFs in DIR and reuse them on later runs "
+                             "(default: a temporary folder)")
+    parser.add_argument('-o', '--output', default='benchmark_results.json', metavar='FILE',
+                        help="where to write the JSON results (default: benchmark_results.json)")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="compare against an earlier results file and exit with status 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, metavar='FRACTION',
+                        help="slowdown or memory growth that counts as a regression (default: 0.10)")
+    parser.add_argument('--startup', action='store_true',
+                        help="instead of the parsers, time importing the converter and runs over an empty "
+                             "Convert/ and a single W-2; exit with status 1 if the import budget is broken")
+    parser.add_argument('--import-budget', type=float, default=DEFAULT_IMPORT_BUDGET, metavar='SECONDS',
+                        help=f"longest acceptable import time with --startup (default: {DEFAULT_IMPORT_BUDGET})")
+    parser.add_argument('--check-duplicates', action='store_true',
+                        help="instead of the parsers, check that a statement keeps its transactions when an "
+                             "identical copy is added on a later run (with and without --incremental); "
+                             "exit with status 1 if it doesn't")
+    parser.add_argument('--run-one', nargs=2, metavar=('PARSER', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one[0], args.run_one[1], args.w2_mode, args.text_backend)))
+        return 0
+    if any(pages < 1 for pages in args.pages):
+        parser.error("--pages must be 1 or greater")
+    if args.repeat < 1:
+        parser.error("--repeat must be 1 or greater")
+
+    if args.startup:
+        startup = run_startup(args.repeat)
+        print(f"import pdf_converter:       {startup['import_seconds']:.3f}s")
+        print(f"run with an empty Convert/: {startup['empty_run_seconds']:.3f}s")
+        print(f"run with one W-2:           {startup['one_w2_seconds']:.3f}s")
+        print(f"  again, --incremental:     {startup['one_w2_unchanged_seconds']:.3f}s")
+        problems = check_startup(startup, args.import_budget)
+        if problems:
+            print(f"\n⚠️  Import budget broken:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print(f"\n✓ Within the import budget ({args.import_budget:.3f}s, no heavy modules)")
+        return 0
+
+    if args.check_duplicates:
+        problems = [f"{' '.join(run_args) or 'default'}: {problem}"
+                    for run_args in ((), ('--incremental',)) for problem in run_duplicate_check(*run_args)]
+        if problems:
+            print("⚠️  Duplicate files lost transactions:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print("✓ A statement keeps its transactions when an identical copy is added")
+        return 0
+
+    with contextlib.ExitStack() as stack:
+        corpus_dir = args.corpus or stack.enter_context(tempfile.TemporaryDirectory(prefix='pdf_corpus_'))
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        results = []
+        for parser_name in args.parsers:
+            for pages in args.pages:
+                print(f"Benchmarking {parser_name} at {pages} page(s)...")
+                pdf_path = corpus_pdf(corpus_dir, parser_name, pages)
+                runs = [run_in_subprocess(parser_name, pdf_path, args.w2_mode, args.text_backend) for _ in range(args.repeat)]
+                results.append(min(runs, key=lambda run: run['stages']['extract'] + run['stages']['parse']))
+
+    import pdfplumber
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pdfplumber': pdfplumber.__version__,
+        'w2_mode': args.w2_mode,
+        'text_backend': args.text_backend,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_results(results)
+    print(f"\nResults written to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\n✓ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
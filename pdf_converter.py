@@ -3,12 +3,29 @@
 Standalone PDF to Excel Converter - No GUI version for testing
 """
 
+import argparse
+import collections
+import collections.abc
+import contextlib
+import csv
+import decimal
+import functools
+import glob
+import hashlib
+import io
+import itertools
+import json
 import os
+import queue
+import shutil
 import sys
+import threading
+import time
 from datetime import datetime
-import pandas as pd
-import pdfplumber
 import re
+# pdfplumber, pdfminer, pandas, pytesseract, pyarrow, sqlite3, zipfile and the
+# process pools are imported where they are first used, so the converter
+# starts quickly and a run that reads no PDFs never loads them.
 
 # Configuration
 VALID_CARDHOLDERS = {
@@ -30,8 +47,1861 @@ BUSINESS_INDICATORS = [
     'VARIETY', 'RETAIL'
 ]
 
-class SimplePDFConverter:
+# Trailing city names stripped from merchants (case-insensitive)
+MERCHANT_CITIES = [
+    'San Francisco', 'San Jose', 'San Bruno', 'San Mateo', 'Daly City',
+    'South San Fra', 'Burlingame', 'Vallejo', 'Oakland', 'Berkeley',
+    'Sacramento', 'Los Angeles', 'Las Vegas', 'West Hollywood'
+]
+
+# Payment processor prefixes stripped from merchants, checked in this order
+MERCHANT_PREFIXES = ['TST* ', 'TST*', 'SPO*', 'SQ *']
+
+# Bump when clean_merchant changes so saved merchant dictionaries are rebuilt
+MERCHANT_RULES_VERSION = 1
+
+INPUT_SUBDIRS = ['amex', 'chase', 'invoice', 'other', 'w2']
+
+
+class MultiPatternMatcher:
+    """Aho-Corasick automaton that finds every occurrence of a fixed set of strings.
+    
+    Built once; a search walks the text a single time, so its cost depends on
+    the text length and the number of matches, not on how many patterns there
+    are. With ignore_case, ASCII letters match either case.
+    """
+    
+    def __init__(self, patterns, ignore_case=False):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]   # Pattern indices ending at each state, via fail links
+        self._terminal = [-1]  # Pattern index ending exactly at each state
+        
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in (pattern.lower() if ignore_case else pattern):
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._terminal.append(-1)
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._outputs[state].append(index)
+            if self._terminal[state] == -1:
+                self._terminal[state] = index
+        
+        # Breadth-first pass to link each state to its longest proper suffix state
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+                queue.append(child)
+        
+        if ignore_case:
+            for edges in self._goto:
+                for ch, child in list(edges.items()):
+                    upper = ch.upper()
+                    if len(upper) == 1 and upper != ch:
+                        edges[upper] = child
+    
+    def finditer(self, text):
+        """Yield (start, pattern_index) for every occurrence, in order of where it ends."""
+        goto, fail, outputs, patterns = self._goto, self._fail, self._outputs, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in outputs[state]:
+                yield i - len(patterns[index]) + 1, index
+    
+    def contains_any(self, text):
+        """True if any pattern occurs in text."""
+        return next(self.finditer(text), None) is not None
+    
+    def longest_match(self, text):
+        """The longest pattern occurring in text (earliest on ties), or None."""
+        best = None
+        for start, index in self.finditer(text):
+            pattern = self.patterns[index]
+            if best is None or len(pattern) > len(best[1]) or (len(pattern) == len(best[1]) and start < best[0]):
+                best = (start, pattern)
+        return best[1] if best else None
+    
+    def prefix_indices(self, text):
+        """Indices of the patterns that text starts with, shortest first."""
+        indices = []
+        state = 0
+        for ch in text:
+            state = self._goto[state].get(ch)
+            if state is None:
+                break
+            if self._terminal[state] != -1:
+                indices.append(self._terminal[state])
+        return indices
+
+# Output sheet layouts
+TRANSACTION_COLUMNS = ['Name', 'Date', 'Merchant', 'Amount']
+W2_COLUMNS = ['Employer Name', 'Employee Name', 'Gross Salary', 'Federal Tax',
+              'SSN', 'Medicare', 'State Witholds', 'SDI']
+INVOICE_SUMMARY_COLUMNS = ['Register ID', 'Business Date', 'Company', 'Print Date',
+                           'Total Invoices', 'Total Amount', 'Subtotal']
+INVOICE_LINE_COLUMNS = ['Invoice Number', 'Customer Name', 'Customer ID',
+                        'Product Amount', 'Misc Charges', 'Subtotal', 'Total Amount',
+                        'Business Date', 'Print Date']
+CURRENCY_FORMAT = '$#,##0.00'
+
+# Output formats (--format); everything but xlsx is written as a typed dataset
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet', 'arrow')
+DATASET_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Column types of the datasets: category (dictionary-encoded text), string,
+# date (MM/DD/YYYY or MM/DD/YY), money (decimal with 2 places) and int
+TRANSACTION_TYPES = {'Name': 'category', 'Date': 'date', 'Merchant': 'category', 'Amount': 'money'}
+W2_TYPES = {'Employer Name': 'category', 'Employee Name': 'string', 'Gross Salary': 'money',
+            'Federal Tax': 'money', 'SSN': 'string', 'Medicare': 'money',
+            'State Witholds': 'money', 'SDI': 'money'}
+INVOICE_SUMMARY_TYPES = {'Register ID': 'string', 'Business Date': 'date', 'Company': 'category',
+                         'Print Date': 'date', 'Total Invoices': 'int', 'Total Amount': 'money',
+                         'Subtotal': 'money'}
+INVOICE_LINE_TYPES = {'Invoice Number': 'string', 'Customer Name': 'category', 'Customer ID': 'string',
+                      'Product Amount': 'money', 'Misc Charges': 'money', 'Subtotal': 'money',
+                      'Total Amount': 'money', 'Business Date': 'date', 'Print Date': 'date'}
+
+
+
+class Record(collections.abc.MutableMapping):
+    """A compact output row: one slot per column, read and written like a dict by column name.
+    
+    Subclasses come from record_type. Money columns are stored as integer
+    cents, so totals add up exactly, and read back as floats. Strings in
+    category columns (cardholders, merchants, employers, customers) are
+    interned, so each distinct name is stored once however many rows (or
+    worker processes and manifests) repeat it. Every column is always
+    present (None until set); a row takes well under half the memory of the
+    equivalent dict.
+    """
+    __slots__ = ()
+    types = {}
+    _slot_names = {}  # Column -> slot
+    _money = frozenset()
+    _interned = frozenset()
+    
+    def __init__(self, fields=()):
+        for slot in self.__slots__:
+            setattr(self, slot, None)
+        for column, value in dict(fields).items():
+            self[column] = value
+    
+    def __getitem__(self, column):
+        value = getattr(self, self._slot_names[column])
+        if column in self._money and type(value) is int:
+            return value / 100
+        return value
+    
+    def __setitem__(self, column, value):
+        if column in self._money and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                and value == value:  # Not NaN
+            value = round(value * 100)
+        elif column in self._interned and type(value) is str:
+            value = sys.intern(value)
+        setattr(self, self._slot_names[column], value)
+    
+    def __delitem__(self, column):
+        raise TypeError(f"{type(self).__name__} columns can't be removed")
+    
+    def __iter__(self):
+        return iter(self.types)
+    
+    def __len__(self):
+        return len(self.types)
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+    
+    def cents(self, column):
+        """A money column as integer cents (None if it isn't a number)."""
+        value = getattr(self, self._slot_names[column])
+        return value if type(value) is int else None
+    
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+    
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, sys.intern(value) if slot in self._interned_slots and type(value) is str else value)
+    
+    def to_json(self):
+        """A JSON-serializable form of the row (see record_from_json), with amounts in cents."""
+        return {'__record__': type(self).__name__, 'values': self.__getstate__()}
+
+
+RECORD_TYPES = {}
+
+
+def record_type(name, types):
+    """A Record subclass with a slot per column of types (a *_TYPES mapping), in that order."""
+    slot_names = {column: column.lower().replace(' ', '_') for column in types}
+    interned = frozenset(column for column, column_type in types.items() if column_type == 'category')
+    cls = type(name, (Record,), {
+        '__module__': __name__,  # So worker processes can pickle the rows
+        '__slots__': tuple(slot_names.values()),
+        'types': dict(types),
+        '_slot_names': slot_names,
+        '_money': frozenset(column for column, column_type in types.items() if column_type == 'money'),
+        '_interned': interned,
+        '_interned_slots': frozenset(slot_names[column] for column in interned),
+    })
+    RECORD_TYPES[name] = cls
+    return cls
+
+
+def record_from_json(data):
+    """json.load object_hook that turns Record.to_json() output back into records."""
+    if '__record__' not in data:
+        return data
+    record = RECORD_TYPES[data['__record__']].__new__(RECORD_TYPES[data['__record__']])
+    record.__setstate__(data['values'])
+    return record
+
+
+TransactionRecord = record_type('TransactionRecord', {**TRANSACTION_TYPES, 'Page': 'int'})
+W2Record = record_type('W2Record', W2_TYPES)
+InvoiceLineRecord = record_type('InvoiceLineRecord', INVOICE_LINE_TYPES)
+
+# SQLite database of every output row, in Excel/ (see Ledger)
+LEDGER_FILE = 'ledger.sqlite'
+
+# --job batches write their output to Excel/jobs/<job file name>/, with a
+# checkpoint per parsed PDF in its checkpoints/ folder (see JobCheckpoints)
+JOBS_DIR = 'jobs'
+CHECKPOINTS_DIR = 'checkpoints'
+
+# Statements shorter than this are never split across page workers
+PAGE_SHARD_MIN_PAGES = 20
+
+# With --vectorized, statement pages are post-processed this many at a time
+VECTORIZED_BATCH_PAGES = 200
+
+# Watch mode (--watch): how often Convert/ is polled when watchdog isn't installed,
+# how long changes must settle before a pass, and how many changed paths may wait
+WATCH_POLL_SECONDS = 1.0
+WATCH_SETTLE_SECONDS = 1.0
+WATCH_QUEUE_SIZE = 1000
+
+# Placeholder cardholder for rows that appear before the first header of a page range
+CARRIED_IN_CARDHOLDER = '<carried-in>'
+
+class StatementLayout:
+    """Line rules for one card issuer's statements.
+    
+    rules is an ordered table of (action, pattern). Each stripped line is
+    checked against the rules in order until one claims it:
+      'skip'             - pattern matches a line to ignore
+      'cardholder'       - an uppercase line naming a known cardholder
+      'cardholder_above' - the cardholder is on the line above one matching pattern
+                           (this rule never claims the line)
+      'transaction'      - pattern groups are (date, merchant, amount)
+    """
+    
+    def __init__(self, rules, date_signal, year_suffix, date_format,
+                 merchant_prefixes=(), header_max_words=3, header_markers=()):
+        self.rules = [(action, re.compile(pattern) if pattern else None) for action, pattern in rules]
+        self.date_signal = re.compile(date_signal)  # Lines that look like they should be transactions
+        self.year_suffix = year_suffix              # Appended to MM/DD dates
+        self.date_format = date_format
+        self.merchant_prefixes = merchant_prefixes
+        self.header_max_words = header_max_words
+        self.header_markers = header_markers        # Text a page must contain to hold a cardholder_above line
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_statement_date(date_str, date_format):
+    """Reformat a statement date as MM/DD/YYYY (memoized; dates repeat on every page)."""
+    return datetime.strptime(date_str, date_format).strftime('%m/%d/%Y')
+
+
+STATEMENT_LAYOUTS = {
+    'amex': StatementLayout(
+        rules=[
+            ('cardholder', None),
+            # MM/DD or MM/DD/YY, merchant, amount
+            ('transaction', r'^(\d{2}/\d{2}(?:/\d{2})?)\s+(.+?)\s+(\$?[\d,]+\.\d{2})$'),
+        ],
+        date_signal=r'^\d{2}/\d{2}',
+        year_suffix='/24',
+        date_format='%m/%d/%y',
+    ),
+    'chase': StatementLayout(
+        rules=[
+            ('cardholder_above', r'Account Number'),
+            ('transaction', r'^(\d{2}/\d{2})\s+(.+?)\s+(-?\$?[\d,]+\.\d{2})$'),
+        ],
+        date_signal=r'^\d{2}/\d{2}\s',
+        year_suffix='/2024',
+        date_format='%m/%d/%Y',
+        merchant_prefixes=('& ', '8 '),  # Leading & or 8 from the card-type column
+        header_markers=('Account Number',),
+    ),
+}
+
+
+class PagePrefilter:
+    """Decides from a page's raw characters whether a statement page can hold anything to parse.
+    
+    The raw characters (see page_chars) come straight from the content
+    stream without any layout, at a small fraction of extract_text()'s cost.
+    They are in the order the PDF draws them, not reading order, so a header
+    whose words are drawn right to left, or a date whose "MM/" and "DD" are
+    separate text objects, won't appear in them as it reads. The check is
+    therefore loose: with whitespace removed, a page is kept if a "/" sits
+    next to a digit (any MM/DD date, however it is split) or any single word
+    of a known cardholder name or of the layout's header markers appears.
+    Terms, rewards and legal pages usually have none of these and are
+    skipped. Pages with no characters at all are kept, so they are still
+    reported as having no text. A PDF that draws the characters of a single
+    word out of order can still defeat the check; --no-prefilter turns it off.
+    """
+    DATE_TOKEN = re.compile(r'\d/|/\d')
+    
+    def __init__(self, markers):
+        self.markers = sorted({word for marker in markers for word in marker.split()})
+        self._matcher = MultiPatternMatcher(self.markers)
+        self._markers_hash = hashlib.sha256('\n'.join(self.markers).encode('utf-8')).hexdigest()[:16]
+    
+    @classmethod
+    def for_layout(cls, layout_name):
+        return cls(STATEMENT_LAYOUTS[layout_name].header_markers + tuple(VALID_CARDHOLDERS))
+    
+    @property
+    def settings(self):
+        """Cache settings for the pages it skips (pdfminer decodes the characters)."""
+        return f'pdfplumber-{pdfplumber_version()}:prefilter-2:{self._markers_hash}'
+    
+    def keeps(self, chars):
+        chars = ''.join(chars.split())
+        return not chars or bool(self.DATE_TOKEN.search(chars)) or self._matcher.contains_any(chars)
+
+# W-2 parsing: 'text' scans extract_text() lines, 'layout' reads boxes by position
+W2_MODES = ('text', 'layout')
+W2_SSN_PATTERN = re.compile(r'\d{3}-\d{2}-\d{4}')
+W2_LINE_TOLERANCE = 3  # Words whose tops differ by at most this many points share a line
+W2_CELL_GAP = 8        # A wider gap between words on a line starts a new box
+
+
+def group_word_cells(words, line_tolerance=W2_LINE_TOLERANCE, cell_gap=W2_CELL_GAP):
+    """Group extract_words() output into lines of cells, top to bottom.
+    
+    A cell is a run of words on one line with no gap wider than cell_gap;
+    on a form that is one box label or one box value. Cells are dicts with
+    the text, its lowercase form and the x0/x1/top/bottom of the run.
+    """
+    lines = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and word['top'] - lines[-1][0]['top'] <= line_tolerance:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    
+    cell_lines = []
+    for line_words in lines:
+        cells = []
+        for word in sorted(line_words, key=lambda w: w['x0']):
+            if cells and word['x0'] - cells[-1]['x1'] <= cell_gap:
+                cell = cells[-1]
+                cell['text'] += ' ' + word['text']
+                cell['x1'] = max(cell['x1'], word['x1'])
+                cell['bottom'] = max(cell['bottom'], word['bottom'])
+            else:
+                cells.append({key: word[key] for key in ('text', 'x0', 'x1', 'top', 'bottom')})
+        for cell in cells:
+            cell['lower'] = cell['text'].lower()
+        cell_lines.append(cells)
+    return cell_lines
+
+
+# Ligatures that pdfplumber expands when it builds words and text
+LIGATURES = {'ﬀ': 'ff', 'ﬃ': 'ffi', 'ﬄ': 'ffl', 'ﬁ': 'fi', 'ﬂ': 'fl', 'ﬆ': 'st', 'ﬅ': 'st'}
+
+
+def _layout_chars(page):
+    """(top, bottom, x0, x1, text, upright) of every char on a page, in pdfplumber's order."""
+    from pdfminer.layout import LTChar, LTContainer
+    mb_x0, mb_top = page.mediabox[:2]
+    chars = []
+    
+    def collect(items):
+        for item in items:
+            if isinstance(item, LTContainer):
+                collect(item)
+            elif isinstance(item, LTChar):
+                chars.append((page.height - item.y1 + mb_top, page.height - item.y0 + mb_top,
+                              item.x0 + mb_x0, item.x1 + mb_x0, item.get_text(), item.upright))
+    
+    collect(page.layout)
+    return chars
+
+
+def _cluster_index(values, tolerance):
+    """Number each value's cluster, chaining sorted values that are within tolerance."""
+    index = {}
+    cluster = -1
+    last = None
+    for value in sorted(set(values)):
+        if last is None or value > last + tolerance:
+            cluster += 1
+        index[value] = cluster
+        last = value
+    return index
+
+
+def layout_word_lines(page, x_tolerance=3, y_tolerance=3):
+    """A page's words grouped into lines, read straight from pdfminer's laid-out chars.
+    
+    Follows pdfplumber's word extraction with its default settings, but
+    skips converting every char into pdfplumber's attribute dict, which is
+    most of the cost of reading a text-heavy page. Returns None for pages
+    with rotated text, which this doesn't handle.
+    """
+    chars = _layout_chars(page)
+    if not all(char[5] for char in chars):
+        return None
+    
+    line_index = _cluster_index([char[0] for char in chars], y_tolerance)
+    chars.sort(key=lambda char: line_index[char[0]])
+    lines = []
+    for _, line_chars in itertools.groupby(chars, key=lambda char: line_index[char[0]]):
+        words = []
+        word = None
+        for top, bottom, x0, x1, text, _ in sorted(line_chars, key=lambda char: (char[2], char[3])):
+            if text.isspace():
+                word = None
+                continue
+            text = LIGATURES.get(text, text)
+            if (word is not None and last_x0 <= x0 <= last_x1 + x_tolerance
+                    and abs(top - last_top) <= y_tolerance):
+                word['text'] += text
+                word['x1'] = max(word['x1'], x1)
+                word['top'] = min(word['top'], top)
+                word['bottom'] = max(word['bottom'], bottom)
+            else:
+                word = {'text': text, 'x0': x0, 'x1': x1, 'top': top, 'bottom': bottom}
+                words.append(word)
+            last_x0, last_x1, last_top = x0, x1, top
+        if words:
+            lines.append(words)
+    return lines
+
+
+def layout_words(page):
+    """Words of a page as dicts with text and x0/x1/top/bottom, like page.extract_words()."""
+    lines = layout_word_lines(page)
+    if lines is None:
+        return [{key: word[key] for key in ('text', 'x0', 'x1', 'top', 'bottom')}
+                for word in page.extract_words()]
+    return [word for words in lines for word in words]
+
+
+def layout_text(page, y_tolerance=3):
+    """Text of a page exactly as page.extract_text() returns it, built from layout_word_lines."""
+    lines = layout_word_lines(page)
+    if lines is None:
+        return page.extract_text() or ''
+    # extract_text clusters the words into text lines again, by their tops
+    words = [word for words in lines for word in words]
+    line_index = _cluster_index([word['top'] for word in words], y_tolerance)
+    return '\n'.join(' '.join(word['text'] for word in line_words)
+                     for _, line_words in itertools.groupby(words, key=lambda word: line_index[word['top']]))
+
+
+def page_chars(page):
+    """A pdfplumber page's characters in content-stream order, with no layout.
+    
+    pdfminer decodes each string the page shows, but no char objects,
+    words or lines are built, so this is many times cheaper than
+    extract_text(). The characters are the same ones extract_text() lays
+    out (and any outside the page's box).
+    """
+    from pdfminer.pdfdevice import PDFDevice
+    from pdfminer.pdfinterp import PDFPageInterpreter
+    
+    class CharDevice(PDFDevice):
+        def __init__(self, rsrcmgr):
+            super().__init__(rsrcmgr)
+            self.chars = []
+        
+        def render_string(self, textstate, seq, ncs, graphicstate):
+            font = textstate.font
+            for obj in seq:
+                if isinstance(obj, (bytes, str)):
+                    for cid in font.decode(obj):
+                        with contextlib.suppress(Exception):
+                            self.chars.append(font.to_unichr(cid))
+    
+    device = CharDevice(page.pdf.rsrcmgr)
+    PDFPageInterpreter(page.pdf.rsrcmgr, device).process_page(page.page_obj)
+    return ''.join(device.chars)
+
+
+@functools.lru_cache(maxsize=None)
+def pdfplumber_version():
+    """pdfplumber's version (part of the page cache keys), read without importing it if possible."""
+    try:
+        import importlib.util
+        spec = importlib.util.find_spec('pdfplumber')
+        with open(os.path.join(os.path.dirname(spec.origin), '_version.py'), encoding='utf-8') as f:
+            namespace = {}
+            exec(f.read(), namespace)
+        return namespace['__version__']
+    except Exception:
+        # E.g. in the frozen executable, where there is no _version.py file
+        import pdfplumber
+        return pdfplumber.__version__
+
+
+class TextBackend:
+    """How CachedPDF turns a pdfplumber page into text.
+    
+    settings is part of the page cache key, so text from different
+    backends is cached separately.
+    """
+    name = None
+    settings_format = None  # {version} is pdfplumber's version
+    
+    @property
+    def settings(self):
+        return self.settings_format.format(version=pdfplumber_version())
+    
+    def page_text(self, page):
+        raise NotImplementedError
+
+
+class PdfplumberBackend(TextBackend):
+    """pdfplumber's extract_text(): builds every char object, then lays out lines."""
+    name = 'pdfplumber'
+    settings_format = 'pdfplumber-{version}:extract_text'
+    
+    def page_text(self, page):
+        return page.extract_text() or ''
+
+
+class PdfminerBackend(TextBackend):
+    """The same text, grouped straight from pdfminer's layout chars (see layout_text)."""
+    name = 'pdfminer'
+    settings_format = 'pdfplumber-{version}:layout_text'
+    
+    def page_text(self, page):
+        return layout_text(page)
+
+
+TEXT_BACKENDS = {backend.name: backend for backend in (PdfplumberBackend(), PdfminerBackend())}
+DEFAULT_TEXT_BACKEND = 'pdfplumber'
+DOCUMENT_TYPES = ('amex', 'chase', 'w2', 'invoice')
+
+# Functions listed in profile.json when running with --cprofile
+PROFILE_TOP_FUNCTIONS = 25
+
+# Page text cache (Convert/../.cache/pages); pdfplumber's version is part of the key
+DEFAULT_CACHE_MB = 512
+DEFAULT_MERCHANT_CACHE_ENTRIES = 100000
+TEXT_EXTRACTION_SETTINGS = PdfplumberBackend.settings_format
+WORD_EXTRACTION_SETTINGS = 'pdfplumber-{version}:layout_words-2'
+
+# Scanned pages are OCR'd at the first resolution that reads well enough
+OCR_CONFIG = '--psm 6'
+OCR_RESOLUTIONS = (150, 300)
+OCR_MIN_CONFIDENCE = 80   # Mean tesseract word confidence (0-100)
+OCR_MIN_HIT_RATE = 0.8    # Share of lines starting with a number that parse as invoice lines
+
+# Invoice register line: NUMBER CUSTOMER_NAME (ID) AMOUNTS
+INVOICE_LINE_PATTERN = re.compile(r'^(\d+)\s+(.+?)\s+\((\d+)\)\s+(.+)')
+
+# First-page signatures used to route PDFs in other/ (see fingerprint_document):
+# (weight, pattern) per document type; each pattern scores its weight for every
+# line of the first FINGERPRINT_CHARS characters it matches, up to
+# FINGERPRINT_MAX_MATCHES lines
+DOCUMENT_SIGNATURES = {
+    'amex': [
+        (6, re.compile(r'(?i)american express|\bamex\b')),
+        (1, re.compile(r'^\d{2}/\d{2}/\d{2}\s+.+\s\$?[\d,]+\.\d{2}$')),  # MM/DD/YY transactions
+        (1, re.compile(r'^\d{2}/\d{2}\s+.+\s\$[\d,]+\.\d{2}$')),         # MM/DD transactions in dollars
+    ],
+    'chase': [
+        (6, re.compile(r'(?i)\bchase\b|jpmorgan')),
+        (3, re.compile(r'^Account Number')),
+        (1, re.compile(r'^\d{2}/\d{2}\s+.+\s-?[\d,]+\.\d{2}$')),         # Bare amounts, credits with a minus
+    ],
+    'w2': [
+        (6, re.compile(r'(?i)wage and tax statement|\bw-2\b')),
+        (3, re.compile(r'(?i)social security number|employer identification number|'
+                       r'wages, tips|federal income tax withheld')),
+        (2, re.compile(r'\b\d{3}-\d{2}-\d{4}\b')),                       # SSN
+    ],
+    'invoice': [
+        (6, re.compile(r'(?i)invoice register')),
+        (3, re.compile(r'(?i)business date|print date')),
+        (1, INVOICE_LINE_PATTERN),
+    ],
+}
+DOCUMENT_LABELS = {'amex': 'AmEx statement', 'chase': 'Chase statement', 'w2': 'W-2', 'invoice': 'invoice register'}
+FINGERPRINT_CHARS = 2000
+FINGERPRINT_MAX_MATCHES = 10
+FINGERPRINT_MIN_SCORE = 6
+
+
+def fingerprint_document(first_page_text):
+    """Score the start of a document's first page against DOCUMENT_SIGNATURES.
+
+    Returns (document type, {type: score}); the type is None when no type
+    scores FINGERPRINT_MIN_SCORE or the best two are tied.
+    """
+    lines = [line.strip() for line in first_page_text[:FINGERPRINT_CHARS].split('\n')]
+    scores = {}
+    for doc_type, signature in DOCUMENT_SIGNATURES.items():
+        scores[doc_type] = sum(weight * min(sum(1 for line in lines if pattern.search(line)), FINGERPRINT_MAX_MATCHES)
+                               for weight, pattern in signature)
+    best, runner_up = sorted(scores.values(), reverse=True)[:2]
+    if best < FINGERPRINT_MIN_SCORE or best == runner_up:
+        return None, scores
+    return max(scores, key=scores.get), scores
+
+
+def file_content_hash(path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Characters that are not allowed anywhere in an XML document
+_ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xml_escape(text):
+    """Escape &, < and > (as xml.sax.saxutils.escape does, without importing urllib)."""
+    return text.replace('&', '&amp;').replace('>', '&gt;').replace('<', '&lt;')
+
+
+def _column_letter(index):
+    """Excel column letters for a 0-based column index (0 -> A, 26 -> AA)."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+class StreamingXlsxWriter:
+    """Constant-memory .xlsx writer.
+    
+    Each sheet's XML is streamed straight into the zip file as rows are
+    consumed, so memory stays flat however many rows there are. Number
+    formats and widths are applied per column through a shared cell style
+    rather than per cell.
+    """
+    
+    _CURRENCY_STYLE = 1  # Index into cellXfs below
+    
+    def __init__(self, path):
+        self.path = path
+        self.sheets = []
+        import zipfile
+        self._zip = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._zip.close()
+    
+    def write_sheet(self, title, columns, rows, widths, currency_columns=()):
+        """Stream dict rows into a new sheet. Returns the number of data rows written."""
+        self.sheets.append(title)
+        sheet_path = f'xl/worksheets/sheet{len(self.sheets)}.xml'
+        letters = [_column_letter(i) for i in range(len(columns))]
+        styles = ['' if column not in currency_columns else f' s="{self._CURRENCY_STYLE}"'
+                  for column in columns]
+        
+        count = 0
+        with self._zip.open(sheet_path, 'w', force_zip64=True) as raw:
+            out = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            out.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                      '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">')
+            if widths:
+                out.write('<cols>')
+                for i, width in enumerate(widths[:len(columns)], 1):
+                    out.write(f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>')
+                out.write('</cols>')
+            out.write('<sheetData>')
+            out.write(self._row_xml(1, letters, [''] * len(columns), columns))
+            
+            buffer = []
+            for row in rows:
+                count += 1
+                buffer.append(self._row_xml(count + 1, letters, styles, [row.get(column) for column in columns]))
+                if len(buffer) >= 1000:
+                    out.write(''.join(buffer))
+                    buffer.clear()
+            out.write(''.join(buffer))
+            out.write('</sheetData></worksheet>')
+            out.flush()
+            out.detach()
+        return count
+    
+    @staticmethod
+    def _row_xml(row_num, letters, styles, values):
+        cells = []
+        for letter, style, value in zip(letters, styles, values):
+            if value is None or value == '' or value != value:  # Empty or NaN
+                continue
+            if isinstance(value, str):
+                text = xml_escape(_ILLEGAL_XML_CHARS.sub('', value))
+                cells.append(f'<c r="{letter}{row_num}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+            elif isinstance(value, bool):
+                cells.append(f'<c r="{letter}{row_num}"{style} t="b"><v>{int(value)}</v></c>')
+            else:
+                number = repr(value)
+                if number.endswith('.0'):
+                    number = number[:-2]  # 954.0 -> 954, as openpyxl writes it
+                cells.append(f'<c r="{letter}{row_num}"{style}><v>{number}</v></c>')
+        return f'<row r="{row_num}">{"".join(cells)}</row>'
+    
+    def close(self):
+        """Write the workbook parts that reference the sheets and finish the file."""
+        sheet_entries = ''.join(
+            f'<sheet name="{xml_escape(title)}" sheetId="{i}" r:id="rId{i}"/>'
+            for i, title in enumerate(self.sheets, 1))
+        sheet_rels = ''.join(
+            f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, len(self.sheets) + 1))
+        sheet_types = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, len(self.sheets) + 1))
+        styles_rel = len(self.sheets) + 1
+        
+        self._zip.writestr('[Content_Types].xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{sheet_types}</Types>')
+        self._zip.writestr('_rels/.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>')
+        self._zip.writestr('xl/workbook.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheet_entries}</sheets></workbook>')
+        self._zip.writestr('xl/_rels/workbook.xml.rels',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{sheet_rels}<Relationship Id="rId{styles_rel}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            'Target="styles.xml"/></Relationships>')
+        self._zip.writestr('xl/styles.xml',
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<numFmts count="1"><numFmt numFmtId="164" formatCode="{xml_escape(CURRENCY_FORMAT)}"/></numFmts>'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>')
+        self._zip.close()
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_output_date(value):
+    """A MM/DD/YYYY or MM/DD/YY date as a datetime (None if it's empty or malformed)."""
+    for date_format in ('%m/%d/%Y', '%m/%d/%y'):
+        try:
+            return datetime.strptime(value, date_format)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def _text_value(value):
+    return None if value is None else str(value)
+
+
+def _money_value(value):
+    if value is None or value == '' or value != value:  # Empty or NaN
+        return None
+    return decimal.Decimal(f'{value:.2f}')
+
+
+def _int_value(value):
+    return None if value is None or value == '' else int(value)
+
+
+_DATASET_CONVERTERS = {
+    'category': _text_value,
+    'string': _text_value,
+    'date': parse_output_date,
+    'money': _money_value,
+    'int': _int_value,
+}
+
+
+def write_dataset(dataset_dir, types, rows, output_format, partition_column=None):
+    """Write dict rows as a typed csv, parquet or arrow dataset. Returns the row count.
+    
+    types maps each column, in order, to its type (see TRANSACTION_TYPES).
+    With partition_column, rows are split into month=YYYY-MM folders by that
+    date column (month=unknown if it's empty), which pyarrow and pandas read
+    back as a partitioned dataset. Whatever was in dataset_dir is replaced.
+    """
+    columns = list(types)
+    converters = [_DATASET_CONVERTERS[types[column]] for column in columns]
+    partition_index = columns.index(partition_column) if partition_column else None
+    
+    partitions = {}
+    count = 0
+    for row in rows:
+        record = [convert(row.get(column)) for column, convert in zip(columns, converters)]
+        if partition_index is None:
+            month = None
+        else:
+            date = record[partition_index]
+            month = date.strftime('%Y-%m') if date is not None else 'unknown'
+        partitions.setdefault(month, []).append(record)
+        count += 1
+    
+    if os.path.isdir(dataset_dir):
+        shutil.rmtree(dataset_dir)
+    for month, records in sorted(partitions.items()):
+        partition_dir = dataset_dir if month is None else os.path.join(dataset_dir, f'month={month}')
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, 'part-0' + DATASET_EXTENSIONS[output_format])
+        if output_format == 'csv':
+            _write_csv_part(path, columns, types, records)
+        else:
+            _write_arrow_part(path, columns, types, records, output_format)
+    return count
+
+
+def _write_csv_part(path, columns, types, records):
+    """CSV with ISO dates and plain 2-place amounts; empty cells for missing values."""
+    date_indices = [i for i, column in enumerate(columns) if types[column] == 'date']
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for record in records:
+            for i in date_indices:
+                if record[i] is not None:
+                    record[i] = record[i].strftime('%Y-%m-%d')
+            writer.writerow(record)
+
+
+def _write_arrow_part(path, columns, types, records, output_format):
+    """A Parquet file or Arrow IPC (Feather v2) file; needs pyarrow."""
+    import pyarrow
+    
+    arrow_types = {
+        'category': pyarrow.string(),
+        'string': pyarrow.string(),
+        'date': pyarrow.timestamp('s'),
+        'money': pyarrow.decimal128(15, 2),
+        'int': pyarrow.int64(),
+    }
+    arrays = []
+    for i, column in enumerate(columns):
+        array = pyarrow.array([record[i] for record in records], arrow_types[types[column]])
+        if types[column] == 'category':
+            array = array.dictionary_encode()
+        arrays.append(array)
+    table = pyarrow.Table.from_arrays(arrays, names=columns)
+    
+    if output_format == 'parquet':
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        with pyarrow.ipc.new_file(path, table.schema) as writer:
+            writer.write_table(table)
+
+
+class PageTextCache:
+    """On-disk cache of extracted page text keyed by PDF hash, page and settings.
+    
+    Each entry is a small text file. Its modification time is the LRU clock:
+    hits touch the file, and the oldest entries are evicted once the cache
+    grows past max_bytes.
+    """
+    
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None
+    
+    def _entry_path(self, doc_hash, key, settings):
+        name = hashlib.sha256(f"{doc_hash}:{key}:{settings}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name[:2], name)
+    
+    def get(self, doc_hash, key, settings, track=True):
+        """Return the cached text, or None on a miss."""
+        path = self._entry_path(doc_hash, key, settings)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            if track:
+                self.misses += 1
+            return None
+        
+        with contextlib.suppress(OSError):
+            os.utime(path)  # Mark as recently used
+        if track:
+            self.hits += 1
+        return text
+    
+    def contains(self, doc_hash, key, settings):
+        """True if an entry is cached (without reading it or counting a hit or miss)."""
+        return os.path.exists(self._entry_path(doc_hash, key, settings))
+    
+    def put(self, doc_hash, key, settings, text):
+        """Store text, evicting least recently used entries if over the size cap."""
+        path = self._entry_path(doc_hash, key, settings)
+        data = text.encode('utf-8')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return  # A read-only or full disk only costs us the cache
+        
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._total_bytes += len(data)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _entries(self):
+        """List (mtime, size, path) for every entry on disk."""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                with contextlib.suppress(OSError):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+    
+    def _evict(self):
+        """Drop the oldest entries until the cache is back under 90% of its cap."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total -= size
+        self._total_bytes = total
+
+
+class ConversionManifest:
+    """Fingerprints and parsed outcomes of every input file from the last run.
+    
+    A file whose size and mtime (or, failing that, content hash) are unchanged
+    reuses its stored rows and validation reports instead of being parsed again.
+    VERSION is bumped when a parser's rows change, so stored rows are re-parsed.
+    """
+    
+    VERSION = 3  # 2: invoice registers split by business date; 3: rows stored as records
+    
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.seen = set()
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f, object_hook=record_from_json)
+            if data.get('version') == self.VERSION:
+                self.entries = data['files']
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable manifest: everything is parsed again
+    
+    def lookup(self, key, pdf_path, parser_name, hash_file):
+        """Return the stored outcome for an unchanged file, else None."""
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        if entry is None or entry['parser'] != parser_name:
+            return None
+        
+        stat = os.stat(pdf_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['outcome']
+        if entry['size'] == stat.st_size and entry['sha256'] == hash_file(pdf_path):
+            # Touched but not modified
+            entry['mtime_ns'] = stat.st_mtime_ns
+            return entry['outcome']
+        return None
+    
+    def unchanged_entry(self, key, stat):
+        """The stored entry of a file whose size and mtime (an os.stat result) are unchanged, else None."""
+        entry = self.entries.get(key)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry
+        return None
+    
+    def record(self, key, pdf_path, parser_name, doc_hash, outcome):
+        stat = os.stat(pdf_path)
+        self.entries[key] = {
+            'parser': parser_name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': doc_hash,
+            'outcome': {'result': outcome['result'], 'reports': outcome['reports']},
+        }
+    
+    def save(self):
+        """Write the manifest, dropping files that no longer exist. Returns the number dropped."""
+        removed = [key for key in self.entries if key not in self.seen]
+        for key in removed:
+            del self.entries[key]
+        
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'files': self.entries}, f, default=Record.to_json)
+        os.replace(tmp_path, self.path)
+        return len(removed)
+
+
+class JobCheckpoints(ConversionManifest):
+    """A --job batch's manifest, kept as one checkpoint file per parsed PDF.
+    
+    Each PDF's fingerprint, rows and validation reports are written to
+    their own file (atomically, via a temporary file) as soon as they are
+    recorded, not when the run ends. A batch that is interrupted or
+    crashes keeps every file it finished, and running it again only parses
+    the rest.
+    """
+    
+    def __init__(self, checkpoint_dir):
+        self.path = checkpoint_dir
+        self.entries = {}
+        self.seen = set()
+        with contextlib.suppress(OSError):
+            for name in os.listdir(checkpoint_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(checkpoint_dir, name), encoding='utf-8') as f:
+                        data = json.load(f, object_hook=record_from_json)
+                    if data.get('version') == self.VERSION:
+                        self.entries[data['key']] = data['entry']
+                except (OSError, ValueError, KeyError):
+                    continue  # An unreadable checkpoint's file is parsed again
+    
+    def _checkpoint_path(self, key):
+        return os.path.join(self.path, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32] + '.json')
+    
+    def record(self, key, pdf_path, parser_name, doc_hash, outcome):
+        super().record(key, pdf_path, parser_name, doc_hash, outcome)
+        path = self._checkpoint_path(key)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'key': key, 'entry': self.entries[key]}, f, default=Record.to_json)
+        os.replace(tmp_path, path)
+    
+    def save(self):
+        """Delete the checkpoints of files no longer in the job. Returns the number deleted."""
+        removed = [key for key in self.entries if key not in self.seen]
+        for key in removed:
+            del self.entries[key]
+            with contextlib.suppress(OSError):
+                os.remove(self._checkpoint_path(key))
+        return len(removed)
+
+
+def read_job_file(job_path):
+    """The PDFs a --job file lists, as ([(doc_type or None, path)], patterns matching none).
+    
+    Each line is a PDF path or glob pattern (** matches any number of
+    folders), relative to the job file's folder unless absolute. A document
+    type and = in front (e.g. amex=statements/2024/*.pdf) sets the parser;
+    other PDFs are routed by their first page. Blank lines and lines
+    starting with # are skipped, and a PDF listed twice is kept once.
+    """
+    base_dir = os.path.dirname(os.path.abspath(job_path))
+    files = []
+    listed = set()
+    unmatched = []
+    with open(job_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            doc_type, _, pattern = line.partition('=')
+            if doc_type.strip().lower() in DOCUMENT_TYPES and pattern.strip():
+                doc_type, pattern = doc_type.strip().lower(), pattern.strip()
+            else:
+                doc_type, pattern = None, line
+            paths = sorted(path for path in glob.glob(os.path.join(base_dir, os.path.expanduser(pattern)),
+                                                      recursive=True)
+                           if path.lower().endswith('.pdf') and os.path.isfile(path))
+            if not paths:
+                unmatched.append(line)
+            for path in paths:
+                path = os.path.normpath(path)
+                if path not in listed:
+                    listed.add(path)
+                    files.append((doc_type, path))
+    return files, unmatched
+
+
+class DuplicateIndex:
+    """Hash index of the transactions kept in this run's output, to drop repeats across files.
+    
+    Rows are keyed by their normalized (Name, Date, Merchant, Amount) and
+    source issuer. A key that one file lists n times is kept n times in
+    total: another file's first n copies of it are dropped as duplicates,
+    and any copies past that are kept as new rows. The file that owns each
+    key is saved, so while it is still there and unchanged, the same file
+    keeps those rows on the next run whatever order the files are read in.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}         # key -> [owner file, owner sha256, copies] from the last run
+        self.owners = {}           # key -> (owner file, owner sha256)
+        self.owner_counts = collections.Counter()
+        self.totals = {}           # key -> copies kept (or held for their owner) so far
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.previous = data['keys']
+        except (OSError, ValueError, KeyError):
+            pass  # Missing or unreadable index: the first file to list a row owns it
+    
+    @staticmethod
+    def row_key(source, row):
+        normalized = '\x1f'.join((source, (row['Name'] or '').strip().upper(), row['Date'],
+                                  ' '.join(row['Merchant'].split()).upper(), str(round(row['Amount'] * 100))))
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).hexdigest()
+    
+    def previous_owners(self):
+        """The (file, sha256) of every file that owned a key in the last run."""
+        return {(owner, sha256) for owner, sha256, _ in self.previous.values()}
+    
+    def reserve(self, present):
+        """Hold each key for its last owner if that file ({file: sha256}) is read in this run unchanged.
+        
+        present must leave out files this run skips (e.g. as copies of
+        another file): keys held for them would drop every copy of the rows.
+        """
+        for key, (owner, sha256, copies) in self.previous.items():
+            if present.get(owner) == sha256:
+                self.owners[key] = (owner, sha256)
+                self.totals[key] = copies
+    
+    def filter(self, file_key, sha256, source, rows):
+        """Split one file's rows into (kept, dropped), where dropped is [(row, owner file)]."""
+        seen = collections.Counter()
+        kept = []
+        dropped = []
+        for row in rows:
+            key = self.row_key(source, row)
+            seen[key] += 1
+            owner = self.owners.setdefault(key, (file_key, sha256))
+            if owner[0] == file_key:
+                self.owner_counts[key] = seen[key]
+                self.totals[key] = max(self.totals.get(key, 0), seen[key])
+            elif seen[key] <= self.totals.get(key, 0):
+                dropped.append((row, owner[0]))
+                continue
+            else:
+                self.totals[key] = seen[key]
+            kept.append(row)
+        return kept, dropped
+    
+    def save(self):
+        """Write the owner of every key that its owner listed in this run."""
+        keys = {key: [*self.owners[key], copies] for key, copies in self.owner_counts.items()}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'keys': keys}, f)
+        os.replace(tmp_path, self.path)
+
+
+class Ledger:
+    """SQLite database of the rows each PDF contributed to the output.
+
+    Rows are stored under their source, a file in Convert/ at one content
+    hash, along with their page (where the parser knows it) and position
+    in the file. Storing a source again replaces its rows, so re-reading a
+    file never adds them twice. Sources that changed or were removed stay
+    in the database for historical queries but are no longer current, and
+    the workbooks and data files are written from the current sources'
+    rows, so they can be rebuilt without reading any PDF.
+
+    Columns are the output columns in snake_case. Dates printed as
+    MM/DD/YYYY are kept as YYYY-MM-DD, so they sort and compare as dates;
+    any other date text (e.g. invoice MM/DD/YY dates) is kept as printed.
+    """
+
+    VERSION = 2
+    # SQL that brings a database written by each older version up to the next one;
+    # the ledger is the only copy of its history, so its rows are always kept
+    MIGRATIONS = {
+        # 2: digest of each source's rows, so storing unchanged rows again is skipped.
+        # Empty for existing sources, which makes their next store rewrite them once.
+        1: ["ALTER TABLE sources ADD COLUMN digest TEXT NOT NULL DEFAULT ''"],
+    }
+    TABLES = {
+        'transactions': TRANSACTION_TYPES,
+        'w2': W2_TYPES,
+        'invoice_registers': INVOICE_SUMMARY_TYPES,
+        'invoice_lines': INVOICE_LINE_TYPES,
+    }
+    INDEXES = {
+        'transactions': ('name', 'date', 'merchant'),
+        'w2': ('employee_name',),
+        'invoice_registers': ('business_date',),
+        'invoice_lines': ('customer_name', 'business_date'),
+    }
+    _SQL_TYPES = {'category': 'TEXT', 'string': 'TEXT', 'date': 'TEXT', 'money': 'REAL', 'int': 'INTEGER'}
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None  # Opened on first use
+
+    def __getstate__(self):
+        # Only the main process writes to the database
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    @staticmethod
+    def column_name(column):
+        return column.lower().replace(' ', '_')
+
+    @property
+    def connection(self):
+        """The open database, created or migrated to VERSION on first use.
+        
+        Raises RuntimeError, leaving the file untouched, if it was written by
+        a newer version of the program or isn't a ledger.
+        """
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            import sqlite3
+            connection = sqlite3.connect(self.path)
+            try:
+                self._upgrade(connection)
+            except BaseException:
+                connection.close()
+                raise
+            connection.execute('PRAGMA foreign_keys = ON')
+            self._connection = connection
+        return self._connection
+
+    def _upgrade(self, connection):
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version == self.VERSION:
+            return
+        if version == 0 and connection.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()[0] == 0:
+            # New database
+            connection.executescript(f'BEGIN;\n{self._schema()}\nPRAGMA user_version = {self.VERSION};\nCOMMIT;')
+            return
+        if version > self.VERSION:
+            raise RuntimeError(f"{self.path} was written by a newer version of this program (ledger version "
+                               f"{version}, this one reads up to {self.VERSION}); update the program, or "
+                               f"move the file away to start a new ledger")
+        if version not in self.MIGRATIONS:
+            raise RuntimeError(f"{self.path} is not a ledger this program can read; "
+                               f"move it away to start a new ledger")
+        # Each step and its version number are committed together, so an interrupted upgrade resumes
+        for from_version in range(version, self.VERSION):
+            statements = ''.join(f'{statement};\n' for statement in self.MIGRATIONS[from_version])
+            connection.executescript(f'BEGIN;\n{statements}PRAGMA user_version = {from_version + 1};\nCOMMIT;')
+
+    def _schema(self):
+        statements = ["""
+            CREATE TABLE sources (
+                id INTEGER PRIMARY KEY,
+                file TEXT NOT NULL,      -- path under Convert/, e.g. amex/statement.pdf
+                sha256 TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                parser TEXT NOT NULL,
+                position INTEGER,        -- order in its folder in the latest run; NULL if not current
+                converted TEXT NOT NULL,
+                digest TEXT NOT NULL,    -- hash of the stored rows
+                UNIQUE (file, sha256)
+            )""",
+            "CREATE INDEX sources_folder ON sources (folder, position)"]
+        for table, types in self.TABLES.items():
+            columns = ''.join(f',\n                {self.column_name(column)} {self._SQL_TYPES[column_type]}'
+                              for column, column_type in types.items())
+            statements.append(f"""
+            CREATE TABLE {table} (
+                source_id INTEGER NOT NULL REFERENCES sources (id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                page INTEGER{columns},
+                PRIMARY KEY (source_id, seq)
+            )""")
+            statements.extend(f"CREATE INDEX {table}_{column} ON {table} ({column})"
+                              for column in self.INDEXES[table])
+        return ';\n'.join(statements) + ';'
+
+    @staticmethod
+    def _to_iso_date(value):
+        date = parse_output_date(value) if isinstance(value, str) else None
+        if date is not None and date.strftime('%m/%d/%Y') == value:
+            return date.strftime('%Y-%m-%d')
+        return value  # Empty, or not MM/DD/YYYY: kept as printed
+
+    @staticmethod
+    def _from_iso_date(value):
+        if isinstance(value, str) and len(value) == 10 and value[4] == '-':
+            return f'{value[5:7]}/{value[8:10]}/{value[:4]}'
+        return value
+
+    def store(self, folder, file_key, sha256, parser, tables):
+        """Replace the rows of one source with tables ({table: rows}). Returns its id.
+        
+        Rows identical to the ones already stored for the source are left as they are.
+        """
+        digest = hashlib.blake2b(repr(sorted(tables.items())).encode('utf-8'), digest_size=16).hexdigest()
+        connection = self.connection
+        with connection:
+            converted = datetime.now().isoformat(timespec='seconds')
+            existing = connection.execute('SELECT id, parser, digest FROM sources WHERE file = ? AND sha256 = ?',
+                                          (file_key, sha256)).fetchone()
+            if existing is None:
+                source_id = connection.execute(
+                    'INSERT INTO sources (file, sha256, folder, parser, converted, digest) VALUES (?, ?, ?, ?, ?, ?)',
+                    (file_key, sha256, folder, parser, converted, digest)).lastrowid
+            elif existing[1:] == (parser, digest):
+                return existing[0]
+            else:
+                source_id = existing[0]
+                connection.execute('UPDATE sources SET folder = ?, parser = ?, converted = ?, digest = ? WHERE id = ?',
+                                   (folder, parser, converted, digest, source_id))
+                for table in self.TABLES:
+                    connection.execute(f'DELETE FROM {table} WHERE source_id = ?', (source_id,))
+
+            for table, rows in tables.items():
+                types = self.TABLES[table]
+                columns = list(types)
+                convert = [self._to_iso_date if types[column] == 'date' else None for column in columns]
+                names = ', '.join(self.column_name(column) for column in columns)
+                placeholders = ', '.join('?' * (len(columns) + 3))
+                connection.executemany(
+                    f'INSERT INTO {table} (source_id, seq, page, {names}) VALUES ({placeholders})',
+                    ((source_id, seq, row.get('Page'),
+                      *(row.get(column) if to_sql is None else to_sql(row.get(column))
+                        for column, to_sql in zip(columns, convert)))
+                     for seq, row in enumerate(rows)))
+        return source_id
+
+    def set_current(self, folder, source_ids):
+        """Make source_ids, in this order, the current sources of folder."""
+        with self.connection as connection:
+            connection.execute('UPDATE sources SET position = NULL WHERE folder = ?', (folder,))
+            connection.executemany('UPDATE sources SET position = ? WHERE id = ?',
+                                   [(position, source_id) for position, source_id in enumerate(source_ids)])
+
+    # Record type of each table's rows; the few invoice register rows stay dicts
+    RECORD_TYPES = {'transactions': TransactionRecord, 'w2': W2Record, 'invoice_lines': InvoiceLineRecord}
+
+    def rows(self, table, folder):
+        """The rows of table from folder's current sources, in file and then row order."""
+        columns = list(self.TABLES[table])
+        date_indices = [i for i, column in enumerate(columns) if self.TABLES[table][column] == 'date']
+        names = ', '.join(f'r.{self.column_name(column)}' for column in columns)
+        cursor = self.connection.execute(
+            f'SELECT {names} FROM {table} r JOIN sources s ON s.id = r.source_id '
+            f'WHERE s.folder = ? AND s.position IS NOT NULL ORDER BY s.position, r.seq', (folder,))
+        row_type = self.RECORD_TYPES.get(table, dict)
+        rows = []
+        for values in cursor:
+            values = list(values)
+            for i in date_indices:
+                values[i] = self._from_iso_date(values[i])
+            rows.append(row_type(zip(columns, values)))
+        return rows
+
+    def has_current(self, folder):
+        return self.connection.execute('SELECT 1 FROM sources WHERE folder = ? AND position IS NOT NULL LIMIT 1',
+                                       (folder,)).fetchone() is not None
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+# Merchant caches already loaded in this process, shared by converters unpickled in workers
+_LOADED_MERCHANT_CACHES = {}
+
+
+class MerchantCache:
+    """Bounded LRU of raw merchant string -> cleaned merchant name.
+    
+    With a path, the entries are saved at the end of a run and loaded up
+    front by the next one, so clean_merchant only runs for merchants that
+    have never been seen. A saved file is ignored when the cleaning rules
+    (MERCHANT_CITIES, MERCHANT_PREFIXES, MERCHANT_RULES_VERSION) change.
+    """
+    
+    def __init__(self, max_entries=DEFAULT_MERCHANT_CACHE_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.learned = {}     # Entries added since the last reset, reported back by workers
+        self._entries = None  # Loaded on first use
+    
+    def __getstate__(self):
+        # Workers load the saved dictionary themselves instead of receiving it with every task
+        state = self.__dict__.copy()
+        state['_entries'] = None
+        state['learned'] = {}
+        return state
+    
+    @staticmethod
+    def rules_fingerprint():
+        rules = json.dumps([MERCHANT_CITIES, MERCHANT_PREFIXES, MERCHANT_RULES_VERSION])
+        return hashlib.sha256(rules.encode('utf-8')).hexdigest()
+    
+    def _load(self):
+        entries = collections.OrderedDict()
+        if self.path is None:
+            return entries
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('rules') == self.rules_fingerprint():
+                entries.update(list(data['merchants'].items())[-self.max_entries:])
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass  # Start with an empty dictionary
+        return entries
+    
+    @property
+    def entries(self):
+        if self._entries is None:
+            key = (self.path, self.max_entries)
+            if key not in _LOADED_MERCHANT_CACHES:
+                _LOADED_MERCHANT_CACHES[key] = self._load()
+            self._entries = _LOADED_MERCHANT_CACHES[key]
+        return self._entries
+    
+    def get(self, raw):
+        canonical = self.entries.get(raw)
+        if canonical is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(raw)
+        self.hits += 1
+        return canonical
+    
+    def put(self, raw, canonical):
+        entries = self.entries
+        entries[raw] = canonical
+        self.learned[raw] = canonical
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+    
+    def learn(self, merchants):
+        """Add entries computed in another process."""
+        for raw, canonical in merchants.items():
+            if raw not in self.entries:
+                self.put(raw, canonical)
+    
+    def save(self):
+        """Write the dictionary (least recently used first) if it has a path."""
+        if self.path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'rules': self.rules_fingerprint(), 'merchants': self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # Only costs the next run its warm start
+
+
+class Metrics:
+    """Counters and stage timers for one process.
+    
+    Stage times are exclusive: while a nested stage runs (extract_text inside
+    parse, say) the outer stage's clock is paused, so the stages add up to
+    the time spent in them. Times are kept in the counters as
+    'seconds.<stage>', so worker processes report them like any other counter.
+    """
+    
     def __init__(self):
+        self.counters = collections.Counter()
+        self._open_stages = []  # [name, started] of the stages being timed
+    
+    def __getstate__(self):
+        # A copy sent to a worker process starts outside any stage
+        state = self.__dict__.copy()
+        state['_open_stages'] = []
+        return state
+    
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self._open_stages:
+            outer = self._open_stages[-1]
+            self.counters[f'seconds.{outer[0]}'] += now - outer[1]
+        current = [name, now]
+        self._open_stages.append(current)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._open_stages.pop()
+            self.counters[f'seconds.{name}'] += now - current[1]
+            if self._open_stages:
+                self._open_stages[-1][1] = now
+
+
+class CachedPDF:
+    """A PDF whose page text is read through a PageTextCache.
+    
+    The file is only opened with pdfplumber (and laid out) when a page is
+    missing from the cache, so fully cached documents skip it entirely.
+    Page text comes from backend (a TextBackend; pdfplumber by default).
+    """
+    
+    def __init__(self, pdf_path, cache=None, doc_hash=None, metrics=None, backend=None):
+        self.pdf_path = pdf_path
+        self.cache = cache
+        self.doc_hash = doc_hash
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.backend = backend if backend is not None else TEXT_BACKENDS[DEFAULT_TEXT_BACKEND]
+        self._pdf = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+    
+    @property
+    def pdf(self):
+        """The underlying pdfplumber document, opened on first use."""
+        if self._pdf is None:
+            with self.metrics.stage('open_pdf'):
+                import pdfplumber
+                self._pdf = pdfplumber.open(self.pdf_path)
+        return self._pdf
+    
+    def _cached(self, key, settings, compute, track=True):
+        if self.cache is None:
+            return compute()
+        text = self.cache.get(self.doc_hash, key, settings, track)
+        if text is None:
+            text = compute()
+            self.cache.put(self.doc_hash, key, settings, text)
+        return text
+    
+    @property
+    def page_count(self):
+        return int(self._cached('pages', TEXT_EXTRACTION_SETTINGS.format(version=pdfplumber_version()),
+                                lambda: str(len(self.pdf.pages)), track=False))
+    
+    def _read_page(self, page_num, read):
+        """Run read(page), then drop the page's cached layout objects.
+        
+        pdfplumber keeps every page's chars and layout alive until the whole
+        document is closed; releasing them per page keeps memory flat.
+        """
+        page = self.pdf.pages[page_num]
+        try:
+            return read(page)
+        finally:
+            page.close()
+    
+    def page_text(self, page_num):
+        """Text of one page as returned by extract_text() ('' if there is none)."""
+        def extract():
+            with self.metrics.stage('extract_text'):
+                return self._read_page(page_num, self.backend.page_text)
+        
+        text = self._cached(page_num, self.backend.settings, extract)
+        self.metrics.count('pages')
+        if text:
+            self.metrics.count('lines', text.count('\n') + 1)
+        return text
+    
+    def page_lines(self, page_num, prefilter=None):
+        """Lines of one page's text, top to bottom ([] if there is none).
+        
+        With a prefilter (a PagePrefilter), a page whose text isn't cached
+        is first checked from its raw characters, and None is returned
+        without laying it out if the prefilter skips it.
+        """
+        if prefilter is not None and not self._keeps_page(page_num, prefilter):
+            self.metrics.count('skipped_pages')
+            return None
+        text = self.page_text(page_num)
+        return text.split('\n') if text else []
+    
+    def _keeps_page(self, page_num, prefilter):
+        """Run prefilter on a page, remembering the pages it skips in the cache."""
+        skip_key = f'skip:{page_num}'
+        if self.cache is not None:
+            if self.cache.contains(self.doc_hash, page_num, self.backend.settings):
+                return True  # Reading the cached text is cheaper still
+            if self.cache.contains(self.doc_hash, skip_key, prefilter.settings):
+                return False
+        with self.metrics.stage('prefilter'):
+            keep = prefilter.keeps(self._read_page(page_num, page_chars))
+        if not keep and self.cache is not None:
+            self.cache.put(self.doc_hash, skip_key, prefilter.settings, '')
+        return keep
+    
+    def page_words(self, page_num):
+        """Words of one page as dicts with text and x0/x1/top/bottom (see layout_words)."""
+        def extract():
+            with self.metrics.stage('extract_words'):
+                return json.dumps(self._read_page(page_num, layout_words))
+        
+        self.metrics.count('pages')
+        return json.loads(self._cached(f'words:{page_num}', WORD_EXTRACTION_SETTINGS.format(version=pdfplumber_version()),
+                                       extract))
+    
+    def ocr_text(self, page_num, resolutions=(300,), config=OCR_CONFIG, min_confidence=0,
+                 line_pattern=None, min_hit_rate=0.0, cached_only=False):
+        """OCR one page with tesseract; raises ImportError if OCR isn't installed.
+        
+        The page is rendered at each resolution in turn until the mean word
+        confidence reaches min_confidence and at least min_hit_rate of the
+        lines starting with a digit match line_pattern; the last attempt is
+        kept either way. With cached_only, returns None instead of running OCR.
+        """
+        settings = f"ocr:{','.join(map(str, resolutions))}:{config}"
+        if min_confidence or line_pattern is not None:
+            pattern = line_pattern.pattern if line_pattern is not None else ''
+            settings += f":{min_confidence}:{pattern}:{min_hit_rate}"
+        if cached_only:
+            # Only a hit is counted; a miss is counted when the page is OCR'd
+            text = self.cache.get(self.doc_hash, page_num, settings, track=False) if self.cache is not None else None
+            if text is not None:
+                self.cache.hits += 1
+            return text
+        
+        def run_ocr():
+            import pytesseract
+            self.metrics.count('ocr_pages')
+            with self.metrics.stage('ocr'):
+                for resolution in resolutions:
+                    pil_image = self._read_page(page_num, lambda page: page.to_image(resolution=resolution).original)
+                    data = pytesseract.image_to_data(pil_image, config=config, output_type=pytesseract.Output.DICT)
+                    text, confidence = ocr_data_text(data)
+                    if confidence >= min_confidence and ocr_hit_rate(text, line_pattern) >= min_hit_rate:
+                        break
+            return text
+        
+        return self._cached(page_num, settings, run_ocr)
+
+
+def ocr_data_text(data):
+    """Text and mean word confidence from pytesseract.image_to_data(output_type=DICT)."""
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        if not word.strip():
+            continue
+        lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+        confidence = float(data['conf'][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+    text = '\n'.join(' '.join(words) for words in lines.values())
+    return text, sum(confidences) / len(confidences) if confidences else 0.0
+
+
+def ocr_hit_rate(text, line_pattern):
+    """Share of the lines starting with a digit that match line_pattern (1.0 if none do)."""
+    if line_pattern is None:
+        return 1.0
+    numbered = [line for line in (raw.strip() for raw in text.split('\n')) if line[:1].isdigit()]
+    if not numbered:
+        return 1.0
+    return sum(1 for line in numbered if line_pattern.match(line)) / len(numbered)
+
+
+def _convert_file_in_worker(converter, parser_name, pdf_path):
+    """Process-pool entry point: parse one PDF and capture its console output."""
+    # Files are already spread across processes; don't nest page pools inside them
+    converter.page_workers = 1
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        outcome = converter._convert_file(parser_name, pdf_path)
+    outcome['output'] = output.getvalue()
+    return outcome
+
+
+def _classify_pages_in_worker(converter, layout_name, pdf_path, start, end):
+    """Process-pool entry point: classify one page range of a statement."""
+    counters = converter._counters()
+    with converter._open_pdf(pdf_path, layout_name) as doc:
+        events, last_cardholder = converter._classify_page_range(layout_name, doc, start, end)
+    return events, last_cardholder, converter._counters_since(counters), converter.merchant_cache.learned
+
+
+def _read_invoice_pages_in_worker(converter, pdf_path, start, end):
+    """Process-pool entry point: parse one page range of an invoice register."""
+    # Pages are already spread across processes; OCR this range's scanned pages here
+    converter.page_workers = 1
+    counters = converter._counters()
+    notes = []
+    errors = []
+    with converter._open_pdf(pdf_path, 'invoice') as doc:
+        pages = converter._read_invoice_pages(doc, pdf_path, start, end, errors, notes.append)
+    return pages, notes, errors, converter._counters_since(counters)
+
+
+def _ocr_page_in_worker(converter, pdf_path, page_num):
+    """Process-pool entry point: OCR one scanned invoice page."""
+    counters = converter._counters()
+    with converter._open_pdf(pdf_path, 'invoice') as doc:
+        text = converter._ocr_invoice_page(doc, page_num)
+    return text, converter._counters_since(counters)
+
+
+def _warm_up_worker():
+    """Process-pool entry point: does nothing, so a watch-mode worker starts (and imports) up front."""
+    return os.getpid()
+
+
+def _snapshot_pdfs(input_dir):
+    """{path: (size, mtime_ns)} of the PDFs in every input folder."""
+    snapshot = {}
+    for subdir in INPUT_SUBDIRS:
+        try:
+            entries = os.scandir(os.path.join(input_dir, subdir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def _put_change(changes, path, stopping):
+    """Queue a changed path, waiting while the queue is full (unless the watch is stopping)."""
+    while not stopping.is_set():
+        try:
+            changes.put(path, timeout=WATCH_POLL_SECONDS)
+            return
+        except queue.Full:
+            continue
+
+
+class PollingWatcher(threading.Thread):
+    """Thread that queues every PDF added, changed or removed in the input folders, by polling."""
+    
+    def __init__(self, input_dir, changes, stopping, interval=WATCH_POLL_SECONDS):
+        super().__init__(daemon=True)
+        self.input_dir = input_dir
+        self.changes = changes
+        self.stopping = stopping
+        self.interval = interval
+    
+    def run(self):
+        snapshot = _snapshot_pdfs(self.input_dir)
+        while not self.stopping.wait(self.interval):
+            current = _snapshot_pdfs(self.input_dir)
+            for path in current.keys() | snapshot.keys():
+                if current.get(path) != snapshot.get(path):
+                    _put_change(self.changes, path, self.stopping)
+            snapshot = current
+    
+    def stop(self):
+        self.stopping.set()
+
+
+def start_watcher(input_dir, changes, stopping):
+    """Start queueing changed PDFs under input_dir. Returns (watcher, description).
+    
+    Uses watchdog (inotify, FSEvents or ReadDirectoryChangesW) when it's
+    installed, and polls every WATCH_POLL_SECONDS otherwise. Stop the
+    watcher with stop() and then join().
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        watcher = PollingWatcher(input_dir, changes, stopping)
+        watcher.start()
+        return watcher, f"polling every {WATCH_POLL_SECONDS:g}s; pip install watchdog to be notified instead"
+    
+    class PDFEventHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.event_type not in ('created', 'modified', 'deleted', 'moved', 'closed'):
+                return  # Opened or closed without writing, e.g. by the converter itself
+            for path in (event.src_path, getattr(event, 'dest_path', '')):
+                if not event.is_directory and os.fsdecode(path).lower().endswith('.pdf'):
+                    _put_change(changes, os.fsdecode(path), stopping)
+    
+    observer = Observer()
+    observer.schedule(PDFEventHandler(), input_dir, recursive=True)
+    observer.start()
+    return observer, "watchdog"
+
+
+class SimplePDFConverter:
+    def __init__(self, workers=1, page_workers=1, use_cache=True, cache_mb=DEFAULT_CACHE_MB,
+                 incremental=False, w2_mode='text', text_backends=None, formats=('xlsx',),
+                 vectorized=False, dedup=True, prefilter=True, profile=False, cprofile=False):
         # Works on both Windows and macOS/Linux
         if getattr(sys, 'frozen', False):
             # Running as compiled exe
@@ -43,31 +1913,63 @@ class SimplePDFConverter:
         self.input_dir = os.path.join(self.base_dir, 'Convert')
         self.output_dir = os.path.join(self.base_dir, 'Excel')
         self.validation_errors = []
+        self.workers = workers or os.cpu_count() or 1
+        self.page_workers = page_workers or os.cpu_count() or 1
+        self._pending_reports = None
+        self._doc_hashes = {}
+        self._routes = {}  # PDF in other/ -> (document type or None, note); see _route_other_files
+        self.job_file = None  # See use_job
+        self._cardholder_matcher = MultiPatternMatcher(sorted(VALID_CARDHOLDERS))
+        self._business_matcher = MultiPatternMatcher(BUSINESS_INDICATORS)
+        self._city_matcher = MultiPatternMatcher(MERCHANT_CITIES, ignore_case=True)
+        self._prefix_matcher = MultiPatternMatcher(MERCHANT_PREFIXES)
+        # Statement layout name -> PagePrefilter; empty with prefilter=False
+        self._page_prefilters = ({layout_name: PagePrefilter.for_layout(layout_name) for layout_name in STATEMENT_LAYOUTS}
+                                 if prefilter else {})
+        self.run_counters = collections.Counter()
+        self.incremental = incremental
+        self.w2_mode = w2_mode
+        # Document type ('amex', 'chase', 'w2', 'invoice') -> TEXT_BACKENDS name
+        self.text_backends = dict(text_backends or {})
+        self.formats = tuple(formats)
+        self.vectorized = vectorized
+        self.dedup = dedup
+        self.duplicate_index = None
+        self.ledger = None
+        self.metrics = Metrics()
+        self.profile = profile or cprofile
+        self.cprofile = cprofile
+        self.file_metrics = []
+        self.manifest = None
+        if use_cache:
+            cache_dir = os.path.join(self.base_dir, '.cache', 'pages')
+            self.page_cache = PageTextCache(cache_dir, cache_mb * 1024 * 1024)
+            self.merchant_cache = MerchantCache(path=os.path.join(self.base_dir, '.cache', 'merchants.json'))
+        else:
+            self.page_cache = None
+            self.merchant_cache = MerchantCache()
         
         # Create directories
         for dir_path in [self.input_dir, self.output_dir]:
             os.makedirs(dir_path, exist_ok=True)
         
-        for subdir in ['amex', 'chase', 'invoice', 'other', 'w2']:
+        for subdir in INPUT_SUBDIRS:
             os.makedirs(os.path.join(self.input_dir, subdir), exist_ok=True)
     
+    def __getstate__(self):
+        # Pickled with every worker task: leave out the main process's per-run state, which
+        # grows with the files and rows seen (a worker hashes the one file it opens itself)
+        state = self.__dict__.copy()
+        state.update(manifest=None, duplicate_index=None, ledger=None, file_metrics=[], _doc_hashes={})
+        return state
+    
     def extract_cardholder_name(self, text):
-        """Extract cardholder name if valid."""
-        text = text.strip()
-        if text in VALID_CARDHOLDERS:
-            return text
-        for valid_name in VALID_CARDHOLDERS:
-            if valid_name in text:
-                return valid_name
-        return None
+        """Extract cardholder name if valid (the longest one when names overlap)."""
+        return self._cardholder_matcher.longest_match(text.strip())
     
     def is_business_name(self, text):
         """Check if text contains business indicators."""
-        text_upper = text.upper()
-        for indicator in BUSINESS_INDICATORS:
-            if indicator in text_upper:
-                return True
-        return False
+        return self._business_matcher.contains_any(text.upper())
     
     def parse_amount(self, text):
         """Extract amount from text."""
@@ -90,80 +1992,37 @@ class SimplePDFConverter:
         merchant = re.sub(r'\s+\d{3}[-.]?\d{3}[-.]?\d{4}.*$', '', merchant)
         merchant = re.sub(r'\s+\w+\.\w+\.?\w*.*$', '', merchant)
         
-        # Remove city/state
-        cities = '(San Francisco|San Jose|San Bruno|San Mateo|Daly City|South San Fra|Burlingame|Vallejo|Oakland|Berkeley|Sacramento|Los Angeles|Las Vegas|West Hollywood)'
-        merchant = re.sub(rf'\s+{cities}.*$', '', merchant, flags=re.IGNORECASE)
+        # Remove city/state: cut at the first city that follows whitespace
+        city_starts = [start for start, _ in self._city_matcher.finditer(merchant)
+                       if start > 0 and merchant[start - 1].isspace()]
+        if city_starts:
+            merchant = merchant[:min(city_starts)].rstrip()
         merchant = re.sub(r'\s+[A-Z]{2}$', '', merchant)
         
-        # Remove prefixes
-        for prefix in ['TST* ', 'TST*', 'SPO*', 'SQ *']:
-            if merchant.startswith(prefix):
-                merchant = merchant[len(prefix):].strip()
+        # Remove prefixes, each at most once and in MERCHANT_PREFIXES order
+        last_prefix = -1
+        while True:
+            candidates = [i for i in self._prefix_matcher.prefix_indices(merchant) if i > last_prefix]
+            if not candidates:
+                break
+            last_prefix = min(candidates)
+            merchant = merchant[len(MERCHANT_PREFIXES[last_prefix]):].strip()
         
         return merchant.strip()
     
+    def normalize_merchant(self, merchant):
+        """clean_merchant, memoized through the merchant cache."""
+        canonical = self.merchant_cache.get(merchant)
+        if canonical is None:
+            with self.metrics.stage('clean_merchant'):
+                canonical = self.clean_merchant(merchant)
+            self.merchant_cache.put(merchant, canonical)
+        return canonical
+    
     def parse_amex_pdf(self, pdf_path):
         """Parse AmEx PDF."""
-        transactions = []
         validation_errors = []
-        current_cardholder = None
-        found_cardholders = set()
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if not text:
-                    validation_errors.append(f"Page {page_num + 1}: No text extracted")
-                    continue
-                
-                lines = text.split('\n')
-                page_transactions = 0
-                
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Check for cardholder name
-                    if line.isupper() and len(line.split()) <= 3:
-                        name = self.extract_cardholder_name(line)
-                        if name and not self.is_business_name(line):
-                            current_cardholder = name
-                            found_cardholders.add(name)
-                            continue
-                    
-                    # Parse transaction (MM/DD or MM/DD/YY pattern)
-                    match = re.match(r'^(\d{2}/\d{2}(?:/\d{2})?)\s+(.+?)\s+(\$?[\d,]+\.\d{2})$', line)
-                    if match:
-                        if not current_cardholder:
-                            validation_errors.append(f"Transaction found without cardholder on page {page_num + 1}: {line[:50]}...")
-                            continue
-                            
-                        date_str = match.group(1)
-                        merchant = match.group(2)
-                        amount = self.parse_amount(match.group(3))
-                        
-                        if amount:
-                            # Parse date
-                            if len(date_str) == 5:  # MM/DD
-                                date_str += '/24'  # Add year
-                            try:
-                                date = datetime.strptime(date_str, '%m/%d/%y').strftime('%m/%d/%Y')
-                                transactions.append({
-                                    'Name': current_cardholder,
-                                    'Date': date,
-                                    'Merchant': self.clean_merchant(merchant),
-                                    'Amount': amount
-                                })
-                                page_transactions += 1
-                            except Exception as e:
-                                validation_errors.append(f"Date parsing error on page {page_num + 1}: {date_str} - {str(e)}")
-                        else:
-                            validation_errors.append(f"Amount parsing error on page {page_num + 1}: {match.group(3)}")
-                
-                # Check if page had potential transactions but none were extracted
-                if page_transactions == 0 and any(re.match(r'^\d{2}/\d{2}', line) for line in lines):
-                    validation_errors.append(f"Page {page_num + 1}: Found date patterns but no transactions extracted")
+        transactions = list(self.iter_amex_transactions(pdf_path, validation_errors))
         
         # Save validation report
         self.save_validation_report('amex', validation_errors, len(transactions))
@@ -172,403 +2031,901 @@ class SimplePDFConverter:
     
     def parse_chase_pdf(self, pdf_path):
         """Parse Chase PDF."""
-        transactions = []
         validation_errors = []
-        current_cardholder = None
-        found_cardholders = set()
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if not text:
-                    validation_errors.append(f"Page {page_num + 1}: No text extracted")
-                    continue
+        transactions = list(self.iter_chase_transactions(pdf_path, validation_errors))
+        
+        # Save validation report
+        self.save_validation_report('chase', validation_errors, len(transactions))
+        
+        return transactions
+    
+    def iter_amex_transactions(self, pdf_path, validation_errors=None):
+        """Yield an AmEx statement's transactions page by page.
+        
+        Validation messages are appended to validation_errors (if given) as
+        they are found. See _iter_statement_rows.
+        """
+        return self._iter_statement_rows(pdf_path, 'amex', validation_errors)
+    
+    def iter_chase_transactions(self, pdf_path, validation_errors=None):
+        """Yield a Chase statement's transactions page by page (see iter_amex_transactions)."""
+        return self._iter_statement_rows(pdf_path, 'chase', validation_errors)
+    
+    def _iter_statement_rows(self, pdf_path, layout_name, validation_errors=None):
+        """Yield a card statement's rows, splitting its pages across processes when enabled.
+        
+        Read serially, each page's rows are yielded before the next page is
+        extracted, so only one page is held in memory at a time. With page
+        workers every page range starts with an unknown ("carried-in")
+        cardholder, and the stitching pass fills it in from the range before
+        it, so the rows are identical to walking the pages serially.
+        """
+        if validation_errors is None:
+            validation_errors = []
+        
+        with self._open_pdf(pdf_path, layout_name) as doc:
+            page_count = doc.page_count
+            if self.page_workers <= 1 or page_count < PAGE_SHARD_MIN_PAGES:
+                current_cardholder = None
+                batch_pages = VECTORIZED_BATCH_PAGES if self.vectorized else 1
+                for start in range(0, page_count, batch_pages):
+                    events = []
+                    for page_num in range(start, min(start + batch_pages, page_count)):
+                        current_cardholder = self._classify_page(layout_name, doc, page_num,
+                                                                 current_cardholder, events)
+                    self._finish_raw_transactions(layout_name, events)
+                    yield from self._resolve_events(events, None, validation_errors)
+                return
+        
+        shard_size = -(-page_count // self.page_workers)
+        ranges = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(_classify_pages_in_worker, self, layout_name, pdf_path, start, end)
+                       for start, end in ranges]
+            page_ranges = []
+            for future in futures:
+                with self.metrics.stage('wait_page_workers'):
+                    events, last_cardholder, counters, merchants = future.result()
+                page_ranges.append((events, last_cardholder))
+                self._add_worker_counters(counters)
+                self.merchant_cache.learn(merchants)
+        yield from self._stitch_page_ranges(page_ranges, validation_errors)
+    
+    def _classify_page_range(self, layout_name, doc, start, end):
+        """Classify pages [start, end), returning events and the last cardholder seen."""
+        events = []
+        current_cardholder = CARRIED_IN_CARDHOLDER
+        for page_num in range(start, end):
+            current_cardholder = self._classify_page(layout_name, doc, page_num, current_cardholder, events)
+        self._finish_raw_transactions(layout_name, events)
+        return events, current_cardholder
+    
+    def _classify_page(self, layout_name, doc, page_num, current_cardholder, events):
+        """Classify one page of doc into events; returns the current cardholder."""
+        lines = doc.page_lines(page_num, self._page_prefilters.get(layout_name))
+        if lines is None:
+            return current_cardholder  # Nothing on the page to parse (see PagePrefilter)
+        if not lines:
+            events.append(('error', f"Page {page_num + 1}: No text extracted"))
+            return current_cardholder
+        return self._classify_statement_page(layout_name, page_num, lines, current_cardholder, events)
+    
+    def _stitch_page_ranges(self, page_ranges, validation_errors):
+        """Yield the rows of classified page ranges, resolving carried-in cardholders."""
+        cardholder = None
+        for events, last_cardholder in page_ranges:
+            yield from self._resolve_events(events, cardholder, validation_errors)
+            if last_cardholder != CARRIED_IN_CARDHOLDER:
+                cardholder = last_cardholder
+    
+    def _resolve_events(self, events, cardholder, validation_errors):
+        """Yield the rows in events, filling carried-in rows with cardholder.
+        
+        Error events are appended to validation_errors in document order.
+        """
+        for event in events:
+            kind = event[0]
+            if kind == 'row':
+                yield event[1]
+            elif kind == 'error':
+                validation_errors.append(event[1])
+            elif kind == 'pending':
+                # Row seen before this range's first cardholder header
+                _, outcome, page_num, line = event
+                if not cardholder:
+                    validation_errors.append(f"Transaction found without cardholder on page {page_num + 1}: {line[:50]}...")
+                elif outcome[0] == 'row':
+                    outcome[1]['Name'] = cardholder
+                    yield outcome[1]
+                else:
+                    validation_errors.append(outcome[1])
+            else:
+                # End of page: flag pages with dates that produced no rows
+                _, page_num, has_date_patterns, page_outcomes, pending_outcomes = event
+                page_transactions = sum(1 for outcome in page_outcomes if outcome[0] == 'row')
+                if cardholder:
+                    page_transactions += sum(1 for outcome in pending_outcomes if outcome[0] == 'row')
+                if page_transactions == 0 and has_date_patterns:
+                    validation_errors.append(f"Page {page_num + 1}: Found date patterns but no transactions extracted")
+    
+    def _add_statement_row(self, events, outcome, current_cardholder, page_num, line):
+        """Record a parsed row (or its error); returns False if it waits for a carried-in cardholder."""
+        if current_cardholder == CARRIED_IN_CARDHOLDER:
+            events.append(('pending', outcome, page_num, line))
+            return False
+        if outcome[0] != 'error':
+            outcome[1]['Name'] = current_cardholder
+        events.append(outcome)
+        return True
+    
+    def _classify_statement_page(self, layout_name, page_num, lines, current_cardholder, events):
+        """Classify one statement page's lines in a single pass; returns the current cardholder.
+        
+        Each line is dispatched through the layout's rule table once. The
+        "date patterns but no transactions" signal is collected on the way;
+        the page's outcomes are kept on its end-of-page event so its rows can
+        be counted once they are final (see _finish_raw_transactions).
+        """
+        layout = STATEMENT_LAYOUTS[layout_name]
+        date_signal = layout.date_signal
+        has_date_patterns = False
+        page_outcomes = []
+        pending_outcomes = []
+        
+        for i, raw_line in enumerate(lines):
+            if not has_date_patterns and date_signal.match(raw_line):
+                has_date_patterns = True
+            line = raw_line.strip()
+            if not line:
+                continue
+            
+            for action, pattern in layout.rules:
+                if action == 'skip':
+                    if pattern.match(line):
+                        break
                 
-                lines = text.split('\n')
-                page_transactions = 0
+                elif action == 'cardholder':
+                    # Uppercase line of a few words naming a known cardholder
+                    if line.isupper() and len(line.split()) <= layout.header_max_words:
+                        name = self.extract_cardholder_name(line)
+                        if name and not self.is_business_name(line):
+                            current_cardholder = name
+                            break
                 
-                for i, line in enumerate(lines):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Check for cardholder name (before Account Number)
-                    if i < len(lines) - 1 and 'Account Number' in lines[i + 1]:
+                elif action == 'cardholder_above':
+                    # Cardholder name on the line just above a marker line
+                    if i < len(lines) - 1 and pattern.search(lines[i + 1]):
                         name = self.extract_cardholder_name(line)
                         if name:
                             current_cardholder = name
-                            found_cardholders.add(name)
                         else:
-                            validation_errors.append(f"Unrecognized cardholder on page {page_num + 1}: {line}")
+                            events.append(('error', f"Unrecognized cardholder on page {page_num + 1}: {line}"))
+                
+                elif action == 'transaction':
+                    match = pattern.match(line)
+                    if not match:
+                        continue
+                    if not current_cardholder:
+                        events.append(('error', f"Transaction found without cardholder on page {page_num + 1}: {line[:50]}..."))
+                        break
                     
-                    # Parse transaction
-                    match = re.match(r'^(\d{2}/\d{2})\s+(.+?)\s+(-?\$?[\d,]+\.\d{2})$', line)
-                    if match:
-                        if not current_cardholder:
-                            validation_errors.append(f"Transaction found without cardholder on page {page_num + 1}: {line[:50]}...")
-                            continue
-                            
-                        date_str = match.group(1) + '/2024'
-                        merchant = match.group(2).strip()
-                        
-                        # Remove leading & or 8
-                        if merchant.startswith('& '):
-                            merchant = merchant[2:]
-                        elif merchant.startswith('8 '):
-                            merchant = merchant[2:]
-                        
-                        amount = self.parse_amount(match.group(3).replace('-', ''))
-                        
-                        if amount:
-                            try:
-                                date = datetime.strptime(date_str, '%m/%d/%Y').strftime('%m/%d/%Y')
-                                transactions.append({
-                                    'Name': current_cardholder,
-                                    'Date': date,
-                                    'Merchant': self.clean_merchant(merchant),
-                                    'Amount': amount
-                                })
-                                page_transactions += 1
-                            except Exception as e:
-                                validation_errors.append(f"Date parsing error on page {page_num + 1}: {date_str} - {str(e)}")
-                        else:
-                            validation_errors.append(f"Amount parsing error on page {page_num + 1}: {match.group(3)}")
+                    if self.vectorized:
+                        outcome = self._raw_transaction_outcome(page_num, *match.groups())
+                    else:
+                        outcome = self._transaction_outcome(layout, page_num, *match.groups())
+                    if self._add_statement_row(events, outcome, current_cardholder, page_num, line):
+                        page_outcomes.append(outcome)
+                    else:
+                        pending_outcomes.append(outcome)
+                    break
+        
+        events.append(('page', page_num, has_date_patterns, page_outcomes, pending_outcomes))
+        return current_cardholder
+    
+    def _transaction_outcome(self, layout, page_num, date_str, merchant, amount_str):
+        """Turn a matched transaction line into ('row', row) or ('error', message)."""
+        merchant = merchant.strip()
+        for prefix in layout.merchant_prefixes:
+            if merchant.startswith(prefix):
+                merchant = merchant[len(prefix):]
+                break
+        
+        # Credits are listed with a leading minus; the amount is kept positive
+        amount = self.parse_amount(amount_str.replace('-', ''))
+        if not amount:
+            return ('error', f"Amount parsing error on page {page_num + 1}: {amount_str}")
+        
+        if len(date_str) == 5:  # MM/DD
+            date_str += layout.year_suffix
+        try:
+            date = normalize_statement_date(date_str, layout.date_format)
+        except Exception as e:
+            return ('error', f"Date parsing error on page {page_num + 1}: {date_str} - {str(e)}")
+        
+        return ('row', TransactionRecord({
+            'Name': None,
+            'Date': date,
+            'Merchant': self.normalize_merchant(merchant),
+            'Amount': amount,
+            'Page': page_num + 1
+        }))
+    
+    @staticmethod
+    def _raw_transaction_outcome(page_num, date_str, merchant, amount_str):
+        """A matched transaction line whose fields are parsed later, in a batch."""
+        return ['raw', TransactionRecord({'Name': None, 'Date': date_str, 'Merchant': merchant,
+                                          'Amount': amount_str, 'Page': page_num + 1}), page_num]
+    
+    def _finish_raw_transactions(self, layout_name, events):
+        """Turn the raw outcomes in events into rows or errors, in place, with pandas.
+        
+        Gives the same rows and messages as _transaction_outcome on each line:
+        dates are parsed once per distinct value, amounts as one numeric
+        column, and merchants are cleaned once per distinct merchant. Lines
+        the vectorized steps can't handle fall back to the per-row functions.
+        """
+        outcomes = [event[1] if event[0] == 'pending' else event for event in events]
+        outcomes = [outcome for outcome in outcomes if outcome[0] == 'raw']
+        if not outcomes:
+            return
+        import pandas as pd
+        
+        layout = STATEMENT_LAYOUTS[layout_name]
+        raw = pd.DataFrame({column: [outcome[1][column] for outcome in outcomes]
+                            for column in ('Date', 'Merchant', 'Amount')})
+        
+        # Merchant: trimmed, minus the first matching layout prefix
+        merchants = raw['Merchant'].str.strip()
+        stripped = pd.Series(False, index=merchants.index)
+        for prefix in layout.merchant_prefixes:
+            has_prefix = ~stripped & merchants.str.startswith(prefix)
+            merchants[has_prefix] = merchants[has_prefix].str[len(prefix):]
+            stripped |= has_prefix
+        
+        # Amount: credits are listed with a leading minus; the amount is kept positive.
+        # A lone amount token converts directly; anything else goes through parse_amount.
+        amount_text = raw['Amount'].str.replace('-', '', regex=False)
+        single_token = amount_text.str.fullmatch(r'\$?[\d,]+\.?\d{0,2}')
+        amounts = pd.to_numeric(amount_text.where(single_token, '').str.replace(r'[$,]', '', regex=True),
+                                errors='coerce')
+        amounts = [None if amount != amount else amount for amount in amounts.tolist()]  # NaN -> None
+        for i in (~single_token).to_numpy().nonzero()[0]:
+            amounts[i] = self.parse_amount(amount_text.iat[i])
+        
+        # Date: MM/DD gets the layout's year, then each distinct date is parsed once
+        dates = raw['Date'].where(raw['Date'].str.len() != 5, raw['Date'] + layout.year_suffix)
+        codes, unique_dates = pd.factorize(dates)
+        parsed = pd.to_datetime(pd.Series(unique_dates, dtype=object), format=layout.date_format, errors='coerce')
+        formatted = parsed.dt.strftime('%m/%d/%Y').astype(object).tolist()
+        for i, value in enumerate(formatted):
+            if not isinstance(value, str):
+                try:
+                    formatted[i] = normalize_statement_date(unique_dates[i], layout.date_format)
+                except Exception as e:
+                    formatted[i] = e
+        
+        dates = dates.tolist()
+        valid = []
+        for i, outcome in enumerate(outcomes):
+            row = outcome[1]
+            date = formatted[codes[i]]
+            if not amounts[i]:
+                outcome[0] = 'error'
+                outcome[1] = f"Amount parsing error on page {outcome[2] + 1}: {row['Amount']}"
+            elif isinstance(date, Exception):
+                outcome[0] = 'error'
+                outcome[1] = f"Date parsing error on page {outcome[2] + 1}: {dates[i]} - {str(date)}"
+            else:
+                row['Date'] = date
+                row['Amount'] = amounts[i]
+                valid.append(i)
+        
+        # Merchant cleanup, once per distinct merchant of the valid rows
+        merchant_codes, unique_merchants = pd.factorize(merchants.iloc[valid])
+        cleaned = [self.normalize_merchant(merchant) for merchant in unique_merchants]
+        for i, code in zip(valid, merchant_codes):
+            outcomes[i][1]['Merchant'] = cleaned[code]
+            outcomes[i][0] = 'row'
+    
+    def parse_w2_pdf(self, pdf_path):
+        """Parse W2 PDF for tax information."""
+        validation_errors = []
+        w2_data = list(self.iter_w2_forms(pdf_path, validation_errors))
+        
+        # Save validation report
+        self.save_validation_report('w2', validation_errors, len(w2_data))
+        
+        return w2_data
+    
+    def iter_w2_forms(self, pdf_path, validation_errors=None):
+        """Yield one dict per W-2 form, reading the PDF a page at a time.
+        
+        Validation messages are appended to validation_errors (if given) as
+        each form is checked.
+        """
+        if validation_errors is None:
+            validation_errors = []
+        
+        with self._open_pdf(pdf_path, 'w2') as doc:
+            forms = self._iter_w2_layout_forms(doc) if self.w2_mode == 'layout' else iter(())
+            first_form = next(forms, None)
+            if first_form is not None:
+                forms = itertools.chain([first_form], forms)
+            else:
+                if self.w2_mode == 'layout':
+                    print("    No W2 boxes found in the page layout, reading the text instead")
+                lines = self._iter_document_lines(doc)
+                first_line = next(lines, None)
+                if first_line is None:
+                    validation_errors.append(f"No text extracted from PDF: {pdf_path}")
+                    return
+                forms = (self._parse_w2_form(ssn, form_lines)
+                         for ssn, form_lines in self._iter_w2_windows(itertools.chain([first_line], lines)))
+            
+            form_count = 0
+            for w2_info in forms:
+                form_count += 1
                 
-                # Check if page had potential transactions but none were extracted
-                if page_transactions == 0 and any(re.match(r'^\d{2}/\d{2}\s', line) for line in lines):
-                    validation_errors.append(f"Page {page_num + 1}: Found date patterns but no transactions extracted")
+                # Track validation errors
+                if not w2_info['Employee Name']:
+                    validation_errors.append(f"Missing employee name for SSN {w2_info['SSN']}")
+                if not w2_info['Employer Name']:
+                    validation_errors.append(f"Missing employer name for SSN {w2_info['SSN']}")
+                if w2_info['Gross Salary'] == 0:
+                    validation_errors.append(f"Missing gross salary for {w2_info['Employee Name'] or 'Unknown'} (SSN: {w2_info['SSN']})")
+                if w2_info['Federal Tax'] == 0:
+                    validation_errors.append(f"Missing federal tax for {w2_info['Employee Name'] or 'Unknown'} (SSN: {w2_info['SSN']})")
+                
+                yield w2_info
+            
+            print(f"    Found {form_count} W2 forms by SSN detection")
+    
+    @staticmethod
+    def _iter_document_lines(doc):
+        """Yield the lines of every page with text, as if the pages were joined by newlines."""
+        has_text = False
+        for page_num in range(doc.page_count):
+            lines = doc.page_lines(page_num)
+            if lines:
+                has_text = True
+                yield from lines
+        if has_text:
+            yield ''  # The trailing newline after the last page
+    
+    @staticmethod
+    def _iter_w2_windows(lines):
+        """Yield (ssn, form_lines) for each W-2 found in a stream of lines.
+        
+        A form is found by an SSN on the line after a "social security number"
+        label. It runs from the line before the label up to the line before the
+        next form's label, or 50 lines (a typical W2 length) for the last form.
+        Only the lines of the form being read are kept.
+        """
+        ssn_pattern = re.compile(r'(\d{3}-\d{2}-\d{4})')
+        window = []          # lines[window_start:] seen so far
+        window_start = 0
+        form = None          # (start line, label line, ssn) of the open form
+        line_count = 0
+        
+        for i, line in enumerate(lines):
+            window.append(line)
+            line_count = i + 1
+            if i > 0 and 'social security number' in window[i - 1 - window_start].lower():
+                ssn_match = ssn_pattern.search(line)
+                if ssn_match:
+                    label_idx = i - 1
+                    if form is not None:
+                        yield form[2], window[form[0] - window_start:label_idx - 1 - window_start]
+                    form_start = max(0, label_idx - 1)
+                    form = (form_start, label_idx, ssn_match.group(1))
+                    del window[:form_start - window_start]
+                    window_start = form_start
+            if form is None and len(window) > 2:
+                # Before the first form only the label and the line above it matter
+                del window[0]
+                window_start += 1
         
-        # Save validation report
-        self.save_validation_report('chase', validation_errors, len(transactions))
+        if form is not None:
+            end_idx = min(form[1] + 50, line_count)
+            yield form[2], window[form[0] - window_start:end_idx - window_start]
+    
+    @staticmethod
+    def _new_w2_info(ssn):
+        return W2Record({
+            'Employer Name': '',
+            'Employee Name': '',
+            'Gross Salary': 0.0,
+            'Federal Tax': 0.0,
+            'SSN': ssn,  # We already have the SSN
+            'Medicare': 0.0,
+            'State Witholds': 0.0,
+            'SDI': 0.0
+        })
+    
+    @staticmethod
+    def _w2_employer_name(employer):
+        """Company name from the line under the employer's name label ('' if none)."""
+        employer = employer.strip()
+        # Handle common case: "Ocomar Enterprises LLC"
+        if 'Ocomar' in employer:
+            return 'Ocomar Enterprises LLC'
+        if not employer or re.match(r'^\d', employer):
+            return ''
+        # Extract just the company name, not the amounts
+        # Split and take the non-numeric parts
+        company_parts = []
+        for part in employer.split():
+            if re.match(r'^[\d,\.]+$', part):
+                break
+            company_parts.append(part)
+        return ' '.join(company_parts)
+    
+    @staticmethod
+    def _w2_employee_name(potential_name):
+        """Cleaned employee name if the text looks like a full name, else None."""
+        potential_name = potential_name.strip()
         
-        return transactions
+        # Look for a line with full name pattern
+        # Should have multiple words and not be a single letter
+        if not (potential_name and
+                len(potential_name) > 5 and
+                ' ' in potential_name and
+                not potential_name in ['C', 'o', 'd', 'e'] and
+                re.match(r'^[A-Z][a-zA-Z]+\s+', potential_name)):
+            return None
+        # Remove trailing single letter (like ' e')
+        potential_name = re.sub(r'\s+[a-z]$', '', potential_name)
+        # Remove any trailing numbers and text that starts with numbers
+        potential_name = re.sub(r'\s+\d+\s+.*$', '', potential_name)
+        return potential_name.strip()
     
-    def parse_w2_pdf(self, pdf_path):
-        """Parse W2 PDF for tax information."""
-        w2_data = []
-        validation_errors = []
+    def _parse_w2_form(self, ssn, form_lines):
+        """Read the boxes of one W-2 form from its text lines."""
+        w2_info = self._new_w2_info(ssn)
+        lowered_lines = [line.lower() for line in form_lines]
         
-        with pdfplumber.open(pdf_path) as pdf:
-            all_text = ""
-            # Combine all pages into one text for easier parsing
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    all_text += text + "\n"
+        # Look for key patterns in the form
+        for i, line in enumerate(form_lines):
+            lower_line = lowered_lines[i]
             
-            if not all_text:
-                validation_errors.append(f"No text extracted from PDF: {pdf_path}")
-                return w2_data
+            # Wages and Federal tax (Box 1 and 2)
+            if 'wages, tips, other compensation' in lower_line and 'federal income tax' in lower_line:
+                # Next line usually has EIN, wages, federal tax
+                if i + 1 < len(form_lines):
+                    next_line = form_lines[i + 1]
+                    # Split by spaces to handle the pattern better
+                    parts = next_line.split()
+                    if len(parts) >= 3:
+                        try:
+                            # First part is EIN (84-4552796), second is wages, third is federal tax
+                            wage_str = parts[1].replace(',', '')
+                            tax_str = parts[2].replace(',', '')
+                            # Validate these are reasonable amounts
+                            wage = float(wage_str)
+                            tax = float(tax_str)
+                            if wage < 1000000 and tax < wage:  # Sanity check
+                                w2_info['Gross Salary'] = wage
+                                w2_info['Federal Tax'] = tax
+                        except:
+                            pass
             
-            # Find all SSN positions to identify W2 boundaries
-            ssn_pattern = r'(\d{3}-\d{2}-\d{4})'
-            ssn_positions = []
+            # Employer name (Box c)
+            if "employer's name" in lower_line or (line.startswith('c ') and 'employer' in lower_line):
+                # Next line should be employer name
+                if i + 1 < len(form_lines):
+                    employer = self._w2_employer_name(form_lines[i + 1])
+                    if employer:
+                        w2_info['Employer Name'] = employer
             
-            lines = all_text.split('\n')
-            for i, line in enumerate(lines):
-                if 'social security number' in line.lower() and i + 1 < len(lines):
-                    ssn_match = re.search(ssn_pattern, lines[i + 1])
-                    if ssn_match:
-                        ssn_positions.append((i, ssn_match.group(1)))
+            # Medicare tax (Box 6)
+            if 'medicare wages' in lower_line and 'medicare tax' in lower_line:
+                if i + 1 < len(form_lines):
+                    next_line = form_lines[i + 1]
+                    numbers = re.findall(r'[\d,]+\.?\d{0,2}', next_line)
+                    if len(numbers) >= 2:
+                        try:
+                            # Second number is medicare tax
+                            w2_info['Medicare'] = float(numbers[1].replace(',', ''))
+                        except:
+                            pass
             
-            print(f"    Found {len(ssn_positions)} W2 forms by SSN detection")
+            # Employee name (Box e) - line contains "Employee's first name"
+            if 'employee' in lower_line and 'first name' in lower_line:
+                # Employee name appears about 4 lines after this label
+                # Skip the single letters C, o, d and find the actual name
+                for j in range(i + 1, min(i + 8, len(form_lines))):
+                    employee = self._w2_employee_name(form_lines[j])
+                    if employee is not None:
+                        w2_info['Employee Name'] = employee
+                        break
             
-            # Process each W2 form
-            for form_idx, (ssn_line_idx, ssn) in enumerate(ssn_positions):
-                # Define the boundaries of this W2 form
-                start_idx = max(0, ssn_line_idx - 1)
-                # End at next W2 or 50 lines later (typical W2 length)
-                if form_idx + 1 < len(ssn_positions):
-                    end_idx = ssn_positions[form_idx + 1][0] - 1
-                else:
-                    end_idx = min(ssn_line_idx + 50, len(lines))
-                
-                # Extract form lines
-                form_lines = lines[start_idx:end_idx]
-                
-                
-                
-                # Initialize W2 info
-                w2_info = {
-                    'Employer Name': '',
-                    'Employee Name': '',
-                    'Gross Salary': 0.0,
-                    'Federal Tax': 0.0,
-                    'SSN': ssn,  # We already have the SSN
-                    'Medicare': 0.0,
-                    'State Witholds': 0.0,
-                    'SDI': 0.0
-                }
-                
-                # Look for key patterns in the form
-                for i, line in enumerate(form_lines):
-                    # Wages and Federal tax (Box 1 and 2)
-                    if 'wages, tips, other compensation' in line.lower() and 'federal income tax' in line.lower():
-                        # Next line usually has EIN, wages, federal tax
-                        if i + 1 < len(form_lines):
-                            next_line = form_lines[i + 1]
-                            # Split by spaces to handle the pattern better
-                            parts = next_line.split()
-                            if len(parts) >= 3:
-                                try:
-                                    # First part is EIN (84-4552796), second is wages, third is federal tax
-                                    wage_str = parts[1].replace(',', '')
-                                    tax_str = parts[2].replace(',', '')
-                                    # Validate these are reasonable amounts
-                                    wage = float(wage_str)
-                                    tax = float(tax_str)
-                                    if wage < 1000000 and tax < wage:  # Sanity check
-                                        w2_info['Gross Salary'] = wage
-                                        w2_info['Federal Tax'] = tax
-                                except:
-                                    pass
-                    
-                    # Employer name (Box c)
-                    if "employer's name" in line.lower() or (line.startswith('c ') and 'employer' in line.lower()):
-                        # Next line should be employer name
-                        if i + 1 < len(form_lines):
-                            employer = form_lines[i + 1].strip()
-                            # Handle common case: "Ocomar Enterprises LLC"
-                            if 'Ocomar' in employer:
-                                w2_info['Employer Name'] = 'Ocomar Enterprises LLC'
-                            elif employer and not re.match(r'^\d', employer):
-                                # Extract just the company name, not the amounts
-                                # Split and take the non-numeric parts
-                                parts = employer.split()
-                                company_parts = []
-                                for part in parts:
-                                    if not re.match(r'^[\d,\.]+$', part):
-                                        company_parts.append(part)
-                                    else:
-                                        break
-                                if company_parts:
-                                    w2_info['Employer Name'] = ' '.join(company_parts)
-                    
-                    # Medicare tax (Box 6)
-                    if 'medicare wages' in line.lower() and 'medicare tax' in line.lower():
-                        if i + 1 < len(form_lines):
-                            next_line = form_lines[i + 1]
-                            numbers = re.findall(r'[\d,]+\.?\d{0,2}', next_line)
-                            if len(numbers) >= 2:
-                                try:
-                                    # Second number is medicare tax
-                                    w2_info['Medicare'] = float(numbers[1].replace(',', ''))
-                                except:
-                                    pass
-                    
-                    # Employee name (Box e) - line contains "Employee's first name"
-                    if 'employee' in line.lower() and 'first name' in line.lower():
-                        # Employee name appears about 4 lines after this label
-                        # Skip the single letters C, o, d and find the actual name
-                        for j in range(i + 1, min(i + 8, len(form_lines))):
-                            potential_name = form_lines[j].strip()
-                            
-                            # Look for a line with full name pattern
-                            # Should have multiple words and not be a single letter
-                            if (potential_name and 
-                                len(potential_name) > 5 and
-                                ' ' in potential_name and
-                                not potential_name in ['C', 'o', 'd', 'e'] and
-                                re.match(r'^[A-Z][a-zA-Z]+\s+', potential_name)):
-                                # Remove trailing single letter (like ' e')
-                                potential_name = re.sub(r'\s+[a-z]$', '', potential_name)
-                                # Remove any trailing numbers and text that starts with numbers
-                                potential_name = re.sub(r'\s+\d+\s+.*$', '', potential_name)
-                                w2_info['Employee Name'] = potential_name.strip()
-                                break
-                    
-                    # State tax (Box 17)
-                    if 'state income tax' in line.lower():
-                        # Look for amount in same or next line
-                        search_lines = [line]
-                        if i + 1 < len(form_lines):
-                            search_lines.append(form_lines[i + 1])
-                        
-                        for search_line in search_lines:
-                            numbers = re.findall(r'[\d,]+\.?\d{0,2}', search_line)
-                            for num in numbers:
-                                try:
-                                    val = float(num.replace(',', ''))
-                                    # State tax should be less than gross salary
-                                    if 0 < val < w2_info.get('Gross Salary', float('inf')):
-                                        w2_info['State Witholds'] = val
-                                        break
-                                except:
-                                    pass
-                    
-                    # SDI
-                    if 'CA SDI' in line:
-                        numbers = re.findall(r'[\d,]+\.?\d{0,2}', line)
-                        if numbers:
-                            try:
-                                w2_info['SDI'] = float(numbers[-1].replace(',', ''))
-                            except:
-                                pass
-                
-                # Validate and add
-                if w2_info['SSN']:
-                    # Track validation errors
-                    errors = []
-                    if not w2_info['Employee Name']:
-                        errors.append(f"Missing employee name for SSN {w2_info['SSN']}")
-                    if not w2_info['Employer Name']:
-                        errors.append(f"Missing employer name for SSN {w2_info['SSN']}")
-                    if w2_info['Gross Salary'] == 0:
-                        errors.append(f"Missing gross salary for {w2_info['Employee Name'] or 'Unknown'} (SSN: {w2_info['SSN']})")
-                    if w2_info['Federal Tax'] == 0:
-                        errors.append(f"Missing federal tax for {w2_info['Employee Name'] or 'Unknown'} (SSN: {w2_info['SSN']})")
-                    
-                    if errors:
-                        validation_errors.extend(errors)
-                    
-                    w2_data.append(w2_info)
+            # State tax (Box 17)
+            if 'state income tax' in lower_line:
+                # Look for amount in same or next line
+                search_lines = [line]
+                if i + 1 < len(form_lines):
+                    search_lines.append(form_lines[i + 1])
+                self._read_w2_state_tax(w2_info, search_lines)
+            
+            # SDI
+            if 'CA SDI' in line:
+                self._read_w2_sdi(w2_info, line)
         
-        # Save validation report
-        self.save_validation_report('w2', validation_errors, len(w2_data))
+        return w2_info
+    
+    @staticmethod
+    def _read_w2_state_tax(w2_info, search_lines):
+        """Set State Witholds from the first amount below the gross salary."""
+        for search_line in search_lines:
+            numbers = re.findall(r'[\d,]+\.?\d{0,2}', search_line)
+            for num in numbers:
+                try:
+                    val = float(num.replace(',', ''))
+                    # State tax should be less than gross salary
+                    if 0 < val < w2_info.get('Gross Salary', float('inf')):
+                        w2_info['State Witholds'] = val
+                        break
+                except:
+                    pass
+    
+    @staticmethod
+    def _read_w2_sdi(w2_info, text):
+        numbers = re.findall(r'[\d,]+\.?\d{0,2}', text)
+        if numbers:
+            try:
+                w2_info['SDI'] = float(numbers[-1].replace(',', ''))
+            except:
+                pass
+    
+    def _iter_w2_layout_forms(self, doc):
+        """Yield a W-2 dict per form, read from the box positions on each page.
         
-        return w2_data
+        Each page's words are grouped into cells once. A form runs from its
+        "social security number" label down to the next form's label, and
+        every box is read from the cells directly under its label.
+        """
+        for page_num in range(doc.page_count):
+            lines = group_word_cells(doc.page_words(page_num))
+            anchors = []
+            for i in range(len(lines) - 1):
+                if any('social security number' in cell['lower'] for cell in lines[i]):
+                    for cell in lines[i + 1]:
+                        ssn_match = W2_SSN_PATTERN.search(cell['text'])
+                        if ssn_match:
+                            anchors.append((i, ssn_match.group(0)))
+                            break
+            
+            for form_idx, (start, ssn) in enumerate(anchors):
+                end = anchors[form_idx + 1][0] if form_idx + 1 < len(anchors) else len(lines)
+                yield self._parse_w2_boxes(ssn, lines[start:end])
+    
+    def _parse_w2_boxes(self, ssn, lines):
+        """Read the boxes of one W-2 form from its lines of word cells."""
+        w2_info = self._new_w2_info(ssn)
+        
+        # Wages and Federal tax (Box 1 and 2)
+        wages = self._w2_box_amount(lines, 'wages, tips, other compensation')
+        federal = self._w2_box_amount(lines, 'federal income tax')
+        if wages is not None and federal is not None:
+            if wages < 1000000 and federal < wages:  # Sanity check
+                w2_info['Gross Salary'] = wages
+                w2_info['Federal Tax'] = federal
+        
+        # Employer name (Box c)
+        for cell in self._w2_box_cells(lines, "employer's name"):
+            w2_info['Employer Name'] = self._w2_employer_name(cell['text'])
+            break
+        
+        # Medicare tax (Box 6)
+        medicare = self._w2_box_amount(lines, 'medicare tax')
+        if medicare is not None:
+            w2_info['Medicare'] = medicare
+        
+        # Employee name (Box e), within a few lines under the label
+        for cell in self._w2_box_cells(lines, 'employee', 'first name', depth=7):
+            employee = self._w2_employee_name(cell['text'])
+            if employee is not None:
+                w2_info['Employee Name'] = employee
+                break
+        
+        # State tax (Box 17): the label cell itself or the cell under it
+        label = self._find_w2_label(lines, 'state income tax')
+        if label is not None:
+            cells = [label[1]] + self._w2_box_cells(lines, 'state income tax')
+            self._read_w2_state_tax(w2_info, [cell['text'] for cell in cells])
+        
+        # SDI
+        for cells in lines:
+            for cell in cells:
+                if 'CA SDI' in cell['text']:
+                    self._read_w2_sdi(w2_info, cell['text'])
+        
+        return w2_info
+    
+    @staticmethod
+    def _find_w2_label(lines, *phrases):
+        """(line index, cell) of the first cell containing every phrase, or None."""
+        for line_idx, cells in enumerate(lines):
+            for cell in cells:
+                if all(phrase in cell['lower'] for phrase in phrases):
+                    return line_idx, cell
+        return None
+    
+    def _w2_box_cells(self, lines, *phrases, depth=1):
+        """Cells in the depth lines under a label that overlap it horizontally."""
+        label = self._find_w2_label(lines, *phrases)
+        if label is None:
+            return []
+        line_idx, label_cell = label
+        return [cell for cells in lines[line_idx + 1:line_idx + 1 + depth] for cell in cells
+                if cell['x0'] < label_cell['x1'] and cell['x1'] > label_cell['x0']]
+    
+    def _w2_box_amount(self, lines, *phrases):
+        """The amount under a box label, or None if there isn't one."""
+        for cell in self._w2_box_cells(lines, *phrases):
+            numbers = re.findall(r'[\d,]+\.?\d{0,2}', cell['text'])
+            if numbers:
+                try:
+                    return float(numbers[0].replace(',', ''))
+                except ValueError:
+                    return None
+        return None
     
     def parse_invoice_pdf(self, pdf_path):
-        """Parse Invoice Register PDF for billing information."""
+        """Parse an Invoice Register PDF: one record per register (business day) in it.
+        
+        Month-long exports hold one register after another, and every page
+        whose header shows a new BUSINESS DATE starts the next one. Pages
+        are parsed one at a time, so only their invoice lines are kept, and
+        large exports are split across page workers like statements are.
+        """
         invoice_data = []
         validation_errors = []
         
-        with pdfplumber.open(pdf_path) as pdf:
-            all_text = ""
-            
-            # First try regular text extraction
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    all_text += text + "\n"
-            
-            # If no text found, try OCR
-            if not all_text.strip():
-                print(f"    No extractable text found. Attempting OCR...")
-                try:
-                    import pytesseract
-                    from PIL import Image
-                    
-                    for page_num, page in enumerate(pdf.pages):
-                        pil_image = page.to_image(resolution=300).original
-                        ocr_text = pytesseract.image_to_string(pil_image, config='--psm 6')
-                        if ocr_text:
-                            all_text += ocr_text + "\n"
-                            print(f"    OCR extracted {len(ocr_text)} characters from page {page_num + 1}")
-                    
-                except ImportError:
-                    validation_errors.append("OCR libraries not installed. Cannot read image-based PDF.")
-                    return invoice_data
-                except Exception as e:
-                    validation_errors.append(f"OCR failed: {str(e)}")
-                    return invoice_data
-            
-            if not all_text.strip():
-                validation_errors.append(f"No text extracted from PDF: {pdf_path}")
-                return invoice_data
+        pages = None
+        with self._open_pdf(pdf_path, 'invoice') as doc:
+            page_count = doc.page_count
+            if self.page_workers <= 1 or page_count < PAGE_SHARD_MIN_PAGES:
+                pages = self._read_invoice_pages(doc, pdf_path, 0, page_count, validation_errors)
+        
+        if pages is None:
+            shard_size = -(-page_count // self.page_workers)
+            ranges = [(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)]
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(_read_invoice_pages_in_worker, self, pdf_path, start, end)
+                           for start, end in ranges]
+                pages = []
+                for future in futures:
+                    with self.metrics.stage('wait_page_workers'):
+                        range_pages, notes, errors, counters = future.result()
+                    pages.extend(range_pages)
+                    for note in notes:
+                        print(note)
+                    validation_errors.extend(error for error in errors if error not in validation_errors)
+                    self._add_worker_counters(counters)
+        
+        if not pages:
+            validation_errors.append(f"No text extracted from PDF: {pdf_path}")
+            self.save_validation_report('invoice', validation_errors, 0)
+            return invoice_data
+        
+        company_name = "OCOMAR FOODS"
+        registers = self._split_invoice_registers(pages)
+        for register in registers:
+            invoice_lines = register['lines']
+            if not invoice_lines:
+                continue
+            business_date = register['business_date']
             
-            lines = all_text.split('\n')
+            # Create a summary record for the register
+            invoice_info = {
+                'Invoice Number': f"Register_{business_date.replace('/', '')}",
+                'Invoice Date': business_date,
+                'Print Date': register['print_date'],
+                'Due Date': '',
+                'Vendor Name': company_name,
+                'Vendor Address': '',
+                'Bill To': 'Multiple Customers',
+                # Summed in cents, so a register of thousands of lines totals exactly
+                'Subtotal': sum(line.cents('Subtotal') for line in invoice_lines) / 100,
+                'Tax Amount': 0.0,  # Tax info not clearly shown in this format
+                'Total Amount': sum(line.cents('Total Amount') for line in invoice_lines) / 100,
+                'Line Items': invoice_lines,
+                'Line Items Count': len(invoice_lines)
+            }
             
-            # Extract register header information
-            business_date = ""
-            print_date = ""
-            company_name = "OCOMAR FOODS"
+            invoice_data.append(invoice_info)
+        
+        if len(invoice_data) == 1:
+            invoice_info = invoice_data[0]
+            print(f"    DEBUG: Parsed {invoice_info['Line Items Count']} invoice lines")
+            print(f"    DEBUG: Total amount: ${invoice_info['Total Amount']:,.2f}")
+            print(f"    DEBUG: Business date: {invoice_info['Invoice Date']}")
+            print(f"    DEBUG: First few invoices:")
+            for i, line in enumerate(invoice_info['Line Items'][:5]):
+                print(f"      {line['Invoice Number']}: {line['Customer Name']} - ${line['Total Amount']:,.2f}")
+        elif invoice_data:
+            print(f"    DEBUG: Found {len(invoice_data)} registers")
+            for invoice_info in invoice_data:
+                print(f"      {invoice_info['Invoice Date'] or '(no business date)'}: "
+                      f"{invoice_info['Line Items Count']} invoice lines, ${invoice_info['Total Amount']:,.2f}")
+        
+        # Validation
+        if not invoice_data:
+            validation_errors.append("No invoice lines found in register")
+        elif len(registers) > 1:
+            for register in registers:
+                if not register['lines']:
+                    validation_errors.append(f"No invoice lines found in register {register['business_date']} "
+                                             f"(page {register['first_page'] + 1})")
+        if not registers[0]['business_date']:
+            validation_errors.append("Missing business date")
+        
+        # Save validation report
+        self.save_validation_report('invoice', validation_errors, len(invoice_data))
+        
+        return invoice_data
+    
+    def _read_invoice_pages(self, doc, pdf_path, start, end, validation_errors, report=print):
+        """Parse pages [start, end) of an invoice register into (page_num, header, invoice lines).
+        
+        Pages with text are parsed as they are read (see _parse_invoice_page),
+        so no page's text is kept; pages without a text layer are OCR'd
+        afterwards. Progress messages go to report. Pages with no text at
+        all are left out.
+        """
+        pages = []
+        scanned_pages = []
+        for page_num in range(start, end):
+            text = doc.page_text(page_num)
+            if text.strip():
+                pages.append((page_num, *self._parse_invoice_page(text)))
+            else:
+                scanned_pages.append(page_num)
+        
+        # OCR only the pages without a text layer
+        if scanned_pages:
+            report(f"    No extractable text found on {len(scanned_pages)} page(s). Attempting OCR...")
+            try:
+                ocr_texts = self._ocr_invoice_pages(doc, pdf_path, scanned_pages)
+                for page_num, ocr_text in zip(scanned_pages, ocr_texts):
+                    if ocr_text:
+                        report(f"    OCR extracted {len(ocr_text)} characters from page {page_num + 1}")
+                    if ocr_text.strip():
+                        pages.append((page_num, *self._parse_invoice_page(ocr_text)))
+                pages.sort(key=lambda page: page[0])
             
-            for line in lines[:10]:  # Check first 10 lines for header info
-                if "BUSINESS DATE:" in line:
-                    date_match = re.search(r'BUSINESS DATE:\s*(\d{2}/\d{2}/\d{2})', line)
-                    if date_match:
-                        business_date = date_match.group(1)
-                
-                if "PRINT DATE:" in line:
-                    date_match = re.search(r'PRINT DATE:\s*(\d{2}/\d{2}/\d{2})', line)
-                    if date_match:
-                        print_date = date_match.group(1)
+            except ImportError:
+                validation_errors.append("OCR libraries not installed. Cannot read image-based PDF.")
+            except Exception as e:
+                validation_errors.append(f"OCR failed: {str(e)}")
+        return pages
+    
+    def _parse_invoice_page(self, text):
+        """The header dates and invoice lines of one register page.
+        
+        Returns ((business_date, print_date), lines); a date is '' if the
+        page's first 10 lines don't show it. The lines get their dates
+        once the page's register is known (see _split_invoice_registers).
+        """
+        lines = text.split('\n')
+        
+        # Extract register header information
+        business_date = ""
+        print_date = ""
+        
+        for line in lines[:10]:  # Check first 10 lines for header info
+            if "BUSINESS DATE:" in line:
+                date_match = re.search(r'BUSINESS DATE:\s*(\d{2}/\d{2}/\d{2})', line)
+                if date_match:
+                    business_date = date_match.group(1)
             
-            # Parse individual invoice lines
-            invoice_lines = []
+            if "PRINT DATE:" in line:
+                date_match = re.search(r'PRINT DATE:\s*(\d{2}/\d{2}/\d{2})', line)
+                if date_match:
+                    print_date = date_match.group(1)
+        
+        # Parse individual invoice lines
+        invoice_lines = []
+        
+        for line in lines:
+            line = line.strip()
+            if not line or "ORDERS PREVIOUSLY CONFIRMED" in line:
+                continue
             
-            for line in lines:
-                line = line.strip()
-                if not line or "ORDERS PREVIOUSLY CONFIRMED" in line:
-                    continue
-                
-                # Look for invoice lines with pattern: NUMBER CUSTOMER_NAME (ID) AMOUNT
-                # Example: 362 CATERMAN'S CATERING I (710) 4,542.65 0.00 : 4,542.65 : 4,542.65
-                invoice_match = re.match(r'^(\d+)\s+(.+?)\s+\((\d+)\)\s+(.+)', line)
-                
-                if invoice_match:
-                    invoice_num = invoice_match.group(1)
-                    customer_name = invoice_match.group(2).strip()
-                    customer_id = invoice_match.group(3)
-                    amounts_part = invoice_match.group(4)
-                    
-                    # Extract amounts from the line
-                    amounts = re.findall(r'[\d,]+\.\d{2}', amounts_part)
-                    
-                    if amounts and len(amounts) >= 3:
-                        try:
-                            # Typically: PRODUCT_AMOUNT MISC_CHG FRT/HAND : SUBTOTAL : TOTAL
-                            product_amount = float(amounts[0].replace(',', ''))
-                            misc_charge = float(amounts[1].replace(',', '')) if len(amounts) > 1 else 0.0
-                            subtotal = float(amounts[-2].replace(',', '')) if len(amounts) >= 2 else product_amount
-                            total = float(amounts[-1].replace(',', ''))
-                            
-                            # Skip zero-amount entries
-                            if total > 0:
-                                invoice_lines.append({
-                                    'Invoice Number': invoice_num,
-                                    'Customer Name': customer_name,
-                                    'Customer ID': customer_id,
-                                    'Product Amount': product_amount,
-                                    'Misc Charges': misc_charge,
-                                    'Subtotal': subtotal,
-                                    'Total Amount': total,
-                                    'Business Date': business_date,
-                                    'Print Date': print_date
-                                })
-                        except ValueError:
-                            continue
+            # Look for invoice lines with pattern: NUMBER CUSTOMER_NAME (ID) AMOUNT
+            # Example: 362 CATERMAN'S CATERING I (710) 4,542.65 0.00 : 4,542.65 : 4,542.65
+            invoice_match = INVOICE_LINE_PATTERN.match(line)
             
-            # Create summary invoice record
-            if invoice_lines:
-                total_amount = sum(line['Total Amount'] for line in invoice_lines)
-                
-                # Create a summary record for the entire register
-                invoice_info = {
-                    'Invoice Number': f"Register_{business_date.replace('/', '')}",
-                    'Invoice Date': business_date,
-                    'Due Date': '',
-                    'Vendor Name': company_name,
-                    'Vendor Address': '',
-                    'Bill To': 'Multiple Customers',
-                    'Subtotal': sum(line['Subtotal'] for line in invoice_lines),
-                    'Tax Amount': 0.0,  # Tax info not clearly shown in this format
-                    'Total Amount': total_amount,
-                    'Line Items': invoice_lines,
-                    'Line Items Count': len(invoice_lines)
-                }
+            if invoice_match:
+                invoice_num = invoice_match.group(1)
+                customer_name = invoice_match.group(2).strip()
+                customer_id = invoice_match.group(3)
+                amounts_part = invoice_match.group(4)
                 
-                invoice_data.append(invoice_info)
+                # Extract amounts from the line
+                amounts = re.findall(r'[\d,]+\.\d{2}', amounts_part)
                 
-                print(f"    DEBUG: Parsed {len(invoice_lines)} invoice lines")
-                print(f"    DEBUG: Total amount: ${total_amount:,.2f}")
-                print(f"    DEBUG: Business date: {business_date}")
-                print(f"    DEBUG: First few invoices:")
-                for i, line in enumerate(invoice_lines[:5]):
-                    print(f"      {line['Invoice Number']}: {line['Customer Name']} - ${line['Total Amount']:,.2f}")
-            
-            # Validation
-            if not invoice_lines:
-                validation_errors.append("No invoice lines found in register")
-            if not business_date:
-                validation_errors.append("Missing business date")
-            
-            # Save validation report
-            self.save_validation_report('invoice', validation_errors, len(invoice_data))
-            
-            return invoice_data
-       
+                if amounts and len(amounts) >= 3:
+                    try:
+                        # Typically: PRODUCT_AMOUNT MISC_CHG FRT/HAND : SUBTOTAL : TOTAL
+                        product_amount = float(amounts[0].replace(',', ''))
+                        misc_charge = float(amounts[1].replace(',', '')) if len(amounts) > 1 else 0.0
+                        subtotal = float(amounts[-2].replace(',', '')) if len(amounts) >= 2 else product_amount
+                        total = float(amounts[-1].replace(',', ''))
+                        
+                        # Skip zero-amount entries
+                        if total > 0:
+                            invoice_lines.append(InvoiceLineRecord({
+                                'Invoice Number': invoice_num,
+                                'Customer Name': customer_name,
+                                'Customer ID': customer_id,
+                                'Product Amount': product_amount,
+                                'Misc Charges': misc_charge,
+                                'Subtotal': subtotal,
+                                'Total Amount': total
+                            }))
+                    except ValueError:
+                        continue
+        
+        return (business_date, print_date), invoice_lines
+    
+    @staticmethod
+    def _split_invoice_registers(pages):
+        """Group parsed register pages (in page order) into registers.
+        
+        A page whose header has a different business date than the current
+        register starts a new one; pages without one continue it. Leading
+        pages take the first business date and print date found. Each
+        register is a dict with its dates, first page and invoice lines,
+        which are given the register's dates.
+        """
+        registers = []
+        for page_num, (business_date, print_date), lines in pages:
+            if (not registers or business_date and registers[-1]['business_date']
+                    and business_date != registers[-1]['business_date']):
+                registers.append({'business_date': '', 'print_date': '', 'first_page': page_num, 'lines': []})
+            register = registers[-1]
+            register['business_date'] = register['business_date'] or business_date
+            register['print_date'] = register['print_date'] or print_date
+            register['lines'].extend(lines)
+        
+        for register in registers:
+            for line in register['lines']:
+                line['Business Date'] = register['business_date']
+                line['Print Date'] = register['print_date']
+        return registers
+    
+    def _ocr_invoice_pages(self, doc, pdf_path, page_nums):
+        """OCR scanned invoice pages, spread across page workers when enabled.
+        
+        Returns the texts in page order. Pages already in the cache are read
+        here; only the rest are sent to worker processes.
+        """
+        texts = {page_num: self._ocr_invoice_page(doc, page_num, cached_only=True) for page_num in page_nums}
+        missing = [page_num for page_num in page_nums if texts[page_num] is None]
+        if self.page_workers <= 1 or len(missing) <= 1:
+            for page_num in missing:
+                texts[page_num] = self._ocr_invoice_page(doc, page_num)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=min(self.page_workers, len(missing))) as executor:
+                futures = {page_num: executor.submit(_ocr_page_in_worker, self, pdf_path, page_num)
+                           for page_num in missing}
+                for page_num, future in futures.items():
+                    with self.metrics.stage('wait_page_workers'):
+                        texts[page_num], counters = future.result()
+                    self._add_worker_counters(counters)
+        return [texts[page_num] for page_num in page_nums]
+    
+    def _ocr_invoice_page(self, doc, page_num, cached_only=False):
+        """OCR one invoice page, starting at a low resolution (see OCR_RESOLUTIONS)."""
+        return doc.ocr_text(page_num, resolutions=OCR_RESOLUTIONS, config=OCR_CONFIG,
+                            min_confidence=OCR_MIN_CONFIDENCE, line_pattern=INVOICE_LINE_PATTERN,
+                            min_hit_rate=OCR_MIN_HIT_RATE, cached_only=cached_only)
+    
     def extract_amount_from_line(self, line):
         """Extract dollar amount from a line of text."""
         # Look for patterns like $1,234.56 or 1234.56
@@ -582,6 +2939,11 @@ class SimplePDFConverter:
     
     def save_validation_report(self, report_type, errors, total_records):
         """Save validation report to a text file."""
+        if self._pending_reports is not None:
+            # Parsing a single file: hold the report until results are merged in order
+            self._pending_reports.append((report_type, errors, total_records))
+            return
+        
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         report_file = os.path.join(self.output_dir, 'Validation_Report.txt')
         
@@ -601,12 +2963,350 @@ class SimplePDFConverter:
                 f.write("✅ No issues found. All data extracted successfully.\n")
             
             f.write(f"\n{'='*60}\n\n")
+
+    def _open_pdf(self, pdf_path, doc_type=None):
+        """Open a PDF for reading page text through the page cache."""
+        backend = TEXT_BACKENDS[self._text_backend_name(doc_type)]
+        if self.page_cache is None:
+            return CachedPDF(pdf_path, metrics=self.metrics, backend=backend)
+        return CachedPDF(pdf_path, self.page_cache, self._document_hash(pdf_path), self.metrics, backend)
     
-    def run(self):
-        """Run the conversion."""
+    def _text_backend_name(self, doc_type):
+        return self.text_backends.get(doc_type, DEFAULT_TEXT_BACKEND)
+    
+    def _document_hash(self, pdf_path):
+        """Content hash of a PDF, memoized for as long as the file is unchanged.
+        
+        With --incremental, the manifest's hash of a file whose size and
+        mtime haven't changed is used instead of reading the file again.
+        """
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._doc_hashes and self.manifest is not None:
+            entry = self.manifest.unchanged_entry(self._manifest_key(pdf_path), stat)
+            self._doc_hashes[key] = entry and entry['sha256']
+        if self._doc_hashes.get(key) is None:
+            with self.metrics.stage('hash_file'):
+                self._doc_hashes[key] = file_content_hash(pdf_path)
+        return self._doc_hashes[key]
+    
+    def _counters(self):
+        """Snapshot of the metrics and cache counters that worker processes report back."""
+        counters = dict(self.metrics.counters)
+        counters['merchant_hits'] = self.merchant_cache.hits
+        counters['merchant_misses'] = self.merchant_cache.misses
+        if self.page_cache is not None:
+            counters['page_cache_hits'] = self.page_cache.hits
+            counters['page_cache_misses'] = self.page_cache.misses
+        return counters
+    
+    def _counters_since(self, start):
+        return {name: value - start.get(name, 0) for name, value in self._counters().items()}
+    
+    def _add_worker_counters(self, counters):
+        """Fold a page worker's counters into this process's caches and metrics."""
+        counters = dict(counters)
+        self.merchant_cache.hits += counters.pop('merchant_hits')
+        self.merchant_cache.misses += counters.pop('merchant_misses')
+        if self.page_cache is not None:
+            self.page_cache.hits += counters.pop('page_cache_hits')
+            self.page_cache.misses += counters.pop('page_cache_misses')
+        self.metrics.counters.update(counters)
+
+    def select_parser(self, subdir, pdf_file):
+        """Pick the parser method name for a PDF based on its folder.
+        
+        PDFs in other/ go by their first page once run() has fingerprinted
+        them (None if it matched no document type), and by their file name
+        otherwise.
+        """
+        if subdir == 'w2':
+            return 'parse_w2_pdf'
+        if subdir == 'invoice':
+            return 'parse_invoice_pdf'
+        if subdir == 'other' and pdf_file in self._routes:
+            doc_type = self._routes[pdf_file][0]
+            return f'parse_{doc_type}_pdf' if doc_type else None
+        if subdir == 'amex' or (subdir == 'other' and 'amex' in pdf_file.lower()):
+            return 'parse_amex_pdf'
+        if subdir == 'chase' or (subdir == 'other' and 'chase' in pdf_file.lower()):
+            return 'parse_chase_pdf'
+        return 'parse_amex_pdf'  # Default
+    
+    def _route_other_files(self, files, label='OTHER files'):
+        """Fingerprint the first page of each PDF in other/ (or a job), filling in self._routes."""
+        print(f"\nRouting {label} by their first page...")
+        for pdf_file, pdf_path in files:
+            doc_type, note = self._fingerprint(pdf_path)
+            self._routes[pdf_file] = (doc_type, note)
+            print(f"  - {pdf_file}: {DOCUMENT_LABELS[doc_type] if doc_type else 'skipped'}")
+    
+    def _fingerprint(self, pdf_path):
+        """(document type, note) for a PDF from its first page; the type is None if it matches none.
+        
+        An unchanged file (by the --incremental manifest) keeps the parser
+        it had last time, without being opened.
+        """
+        if self.manifest is not None:
+            entry = self.manifest.unchanged_entry(self._manifest_key(pdf_path), os.stat(pdf_path))
+            if entry is not None:
+                return entry['parser'].split(':')[0][len('parse_'):-len('_pdf')], "as in the last run"
+        try:
+            with self._open_pdf(pdf_path) as doc:
+                text = doc.page_text(0) if doc.page_count else ''
+        except Exception as e:
+            return None, str(e)
+        
+        doc_type, scores = fingerprint_document(text)
+        if doc_type is not None:
+            return doc_type, f"first page scores {scores[doc_type]}"
+        if not text.strip():
+            return None, ("No text on the first page (scanned?), so its document type is unknown; "
+                          "put it in the folder for its type")
+        scores = ', '.join(f"{DOCUMENT_LABELS[doc_type]} {score}" for doc_type, score in scores.items())
+        return None, (f"Not recognized as any document type by its first page ({scores}); "
+                      f"put it in the folder for its type")
+
+    def _convert_file(self, parser_name, pdf_path):
+        """Run one parser, returning its rows, validation reports and any error."""
+        self._pending_reports = []
+        self.merchant_cache.learned = {}
+        counters = self._counters()
+        self.metrics.count('files')
+        try:
+            with self.metrics.stage('parse'):
+                result = getattr(self, parser_name)(pdf_path)
+            error = None
+            self.metrics.count('rows', len(result))
+        except Exception as e:
+            result = None
+            error = str(e)
+            self.metrics.count('errors')
+        finally:
+            reports, self._pending_reports = self._pending_reports, None
+        self.metrics.count('validation_errors', sum(len(errors) for _, errors, _ in reports))
+        return {'result': result, 'error': error, 'reports': reports, 'output': '',
+                'parser': parser_name, 'counters': self._counters_since(counters),
+                'merchants': self.merchant_cache.learned}
+
+    def _start_jobs(self, jobs, executor):
+        """Schedule every PDF, returning a callable per path that yields its outcome."""
+        outcomes = {}
+        kept_copies = self._kept_copies(jobs) if self.dedup else {}
+        for subdir, files in jobs:
+            for pdf_file, pdf_path in files:
+                parser_name = self.select_parser(subdir, pdf_file)
+                if parser_name is None:
+                    outcomes[pdf_path] = functools.partial(dict, result=None, error=self._routes[pdf_file][1],
+                                                           reports=[], output='', counters={}, merchants={})
+                    continue
+                if self.dedup:
+                    # A byte-identical copy of another file is never parsed
+                    kept_copy = kept_copies[self._document_hash(pdf_path)]
+                    if kept_copy != self._manifest_key(pdf_path):
+                        outcomes[pdf_path] = functools.partial(dict, result=[], error=None, reports=[], output='',
+                                                               counters={}, merchants={}, duplicate_of=kept_copy)
+                        continue
+                if self.manifest is not None:
+                    stored = self.manifest.lookup(self._manifest_key(pdf_path), pdf_path,
+                                                  self._parser_key(parser_name), self._document_hash)
+                    if stored is not None:
+                        outcomes[pdf_path] = functools.partial(dict, stored, error=None, output='',
+                                                               counters={}, merchants={}, unchanged=True)
+                        continue
+                if executor is None:
+                    outcomes[pdf_path] = functools.partial(self._convert_file, parser_name, pdf_path)
+                else:
+                    future = executor.submit(_convert_file_in_worker, self, parser_name, pdf_path)
+                    if self.job_file is not None:
+                        # Checkpoint each file as soon as it's done, not when its turn to be merged comes
+                        # (the callback runs on another thread, so its hash is computed here first)
+                        self._document_hash(pdf_path)
+                        future.add_done_callback(functools.partial(self._checkpoint_future, pdf_path))
+                    outcomes[pdf_path] = future.result
+        return outcomes
+
+    def _kept_copies(self, jobs):
+        """Document hash -> key of the one file with that content that is read; other copies are skipped.
+        
+        That is the first copy in folder order, unless another copy owned
+        rows in the last run (see DuplicateIndex): it is kept instead, so
+        its rows stay where they were rather than moving to the new copy.
+        """
+        owners = self.duplicate_index.previous_owners() if self.duplicate_index is not None else set()
+        kept = {}
+        for subdir, files in jobs:
+            for pdf_file, pdf_path in files:
+                if self.select_parser(subdir, pdf_file) is None:
+                    continue
+                doc_hash = self._document_hash(pdf_path)
+                file_key = self._manifest_key(pdf_path)
+                if doc_hash not in kept or ((file_key, doc_hash) in owners and (kept[doc_hash], doc_hash) not in owners):
+                    kept[doc_hash] = file_key
+        return kept
+
+    def _collect_results(self, subdir, files, outcomes, label, dedup_rows=False):
+        """Merge per-file outcomes in folder order, reporting errors per file.
+        
+        Copies of files seen earlier in the run are skipped. With dedup_rows
+        (for statement folders), transactions already kept from another file
+        are dropped too; both are listed in a DUPLICATES validation report.
+        Each file's rows are stored in the ledger, if there is one.
+        """
+        results = []
+        duplicates = []
+        source_ids = []
+        for pdf_file, pdf_path in files:
+            print(f"  - {pdf_file}")
+            try:
+                outcome = outcomes[pdf_path]()
+            except Exception as e:
+                # The worker process itself failed (e.g. it was killed)
+                outcome = {'result': None, 'error': str(e), 'reports': [], 'output': '',
+                           'counters': {}, 'merchants': {}}
+
+            self.run_counters.update(outcome['counters'])
+            self.merchant_cache.learn(outcome['merchants'])
+            if outcome['output']:
+                sys.stdout.write(outcome['output'])
+            for report in outcome['reports']:
+                self.save_validation_report(*report)
+
+            if outcome['error'] is not None:
+                print(f"    ✗ Error: {outcome['error']}")
+                continue
+            if outcome.get('duplicate_of'):
+                print(f"    ✓ Same file as {outcome['duplicate_of']}, skipped")
+                duplicates.append(f"{self._manifest_key(pdf_path)}: same file as {outcome['duplicate_of']}, skipped")
+                self.run_counters['duplicate_files'] += 1
+                continue
+
+            rows = outcome['result']
+            if dedup_rows and self.duplicate_index is not None:
+                rows, dropped = self.duplicate_index.filter(self._manifest_key(pdf_path), self._document_hash(pdf_path),
+                                                            self.select_parser(subdir, pdf_file)[len('parse_'):-len('_pdf')],
+                                                            rows)
+                for row, owner in dropped:
+                    duplicates.append(f"{self._manifest_key(pdf_path)}: dropped {row['Name']} {row['Date']} "
+                                      f"{row['Merchant']} ${row['Amount']:,.2f}, already in {owner}")
+                self.run_counters['duplicate_rows'] += len(dropped)
+            results.extend(rows)
+            if self.ledger is not None:
+                with self._run_stage('write_ledger'):
+                    source_ids.append(self.ledger.store(subdir, self._manifest_key(pdf_path),
+                                                        self._document_hash(pdf_path),
+                                                        self.select_parser(subdir, pdf_file),
+                                                        self._output_tables(subdir, rows)))
+            verb = "Extracted"
+            if outcome.get('unchanged'):
+                verb = "Checkpointed, reused" if self.job_file is not None else "Unchanged, reused"
+            if len(rows) < len(outcome['result']):
+                print(f"    ✓ {verb} {len(outcome['result'])} {label}, "
+                      f"dropped {len(outcome['result']) - len(rows)} duplicates")
+            else:
+                print(f"    ✓ {verb} {len(rows)} {label}")
+            if outcome.get('unchanged'):
+                continue
+            if self.profile:
+                self.file_metrics.append((self._manifest_key(pdf_path), outcome['parser'], outcome['counters']))
+            self._checkpoint(pdf_path, outcome)
+        if duplicates:
+            self.save_validation_report(f"{subdir} duplicates", duplicates, len(results))
+        if self.ledger is not None:
+            self.ledger.set_current(subdir, source_ids)
+        return results
+
+    def _checkpoint(self, pdf_path, outcome):
+        """Record a parsed file's outcome in the manifest, once."""
+        if self.manifest is None or outcome['error'] is not None or outcome.get('checkpointed'):
+            return
+        self.manifest.record(self._manifest_key(pdf_path), pdf_path, self._parser_key(outcome['parser']),
+                             self._document_hash(pdf_path), outcome)
+        outcome['checkpointed'] = True
+    
+    def _checkpoint_future(self, pdf_path, future):
+        if not future.cancelled() and future.exception() is None:
+            self._checkpoint(pdf_path, future.result())
+    
+    def _manifest_key(self, pdf_path):
+        try:
+            return os.path.relpath(pdf_path, self.input_dir).replace(os.sep, '/')
+        except ValueError:
+            return os.path.abspath(pdf_path)  # A job PDF on another drive (Windows)
+
+    def _parser_key(self, parser_name):
+        """Parser name plus any option that changes its output, for the manifest."""
+        key = parser_name
+        if parser_name == 'parse_w2_pdf':
+            key = f'{key}:{self.w2_mode}'
+        backend_name = self._text_backend_name(parser_name[len('parse_'):-len('_pdf')])
+        if backend_name != DEFAULT_TEXT_BACKEND:
+            key = f'{key}:{backend_name}'
+        return key
+
+    def use_job(self, job_file):
+        """Convert the PDFs listed in job_file (see read_job_file) instead of Convert/.
+        
+        The job's workbooks, validation report, ledger and checkpoints go
+        to Excel/jobs/<job file name>/, and paths are relative to the job
+        file's folder. Every parsed PDF is checkpointed there right away,
+        so running an interrupted job again resumes where it stopped.
+        """
+        self.job_file = os.path.abspath(job_file)
+        self.input_dir = os.path.dirname(self.job_file)
+        job_name = os.path.splitext(os.path.basename(self.job_file))[0]
+        self.output_dir = os.path.join(self.output_dir, JOBS_DIR, job_name)
+        os.makedirs(self.output_dir, exist_ok=True)
+    
+    def _job_folder_files(self):
+        """{output folder: [(name, path)]} for the job's PDFs, routing unprefixed ones by their first page."""
+        files, unmatched = read_job_file(self.job_file)
+        for pattern in unmatched:
+            print(f"⚠️  No PDF files match {pattern!r} in {os.path.basename(self.job_file)}")
+        
+        folder_files = {}
+        unrouted = []
+        for doc_type, pdf_path in files:
+            pdf_file = self._manifest_key(pdf_path)
+            if doc_type is None:
+                unrouted.append((pdf_file, pdf_path))
+            else:
+                folder_files.setdefault(doc_type, []).append((pdf_file, pdf_path))
+        if unrouted:
+            with self._run_stage('fingerprint'):
+                self._route_other_files(unrouted, 'job files')
+            for pdf_file, pdf_path in unrouted:
+                # Files that matched no document type are reported as errors under OTHER
+                folder_files.setdefault(self._routes[pdf_file][0] or 'other', []).append((pdf_file, pdf_path))
+        
+        stored = sum(1 for _, pdf_path in files
+                     if self.manifest.unchanged_entry(self._manifest_key(pdf_path), os.stat(pdf_path)))
+        print(f"\nJob {os.path.basename(self.job_file)}: {len(files)} PDF file(s), "
+              f"{stored} already checkpointed in {self.output_dir}")
+        return folder_files
+    
+    def run(self, executor=None):
+        """Run the conversion.
+        
+        With executor (watch mode's pool of warm workers), files are parsed
+        there instead of in a pool started for this run.
+        """
         print("\nPDF to Excel Converter")
         print("=" * 50)
         
+        started = time.perf_counter()
+        self.run_counters = collections.Counter()
+        self.file_metrics = []
+        profiler = None
+        if self.cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        
+        self.ledger = Ledger(os.path.join(self.output_dir, LEDGER_FILE))
+        if not self._ledger_usable():
+            return
+        
         # Clear validation report at start
         report_file = os.path.join(self.output_dir, 'Validation_Report.txt')
         if os.path.exists(report_file):
@@ -614,7 +3314,15 @@ class SimplePDFConverter:
         
         has_validation_errors = False
         
-        for subdir in ['amex', 'chase', 'invoice', 'other', 'w2']:
+        self._routes = {}
+        if self.job_file is not None:
+            self.manifest = JobCheckpoints(os.path.join(self.output_dir, CHECKPOINTS_DIR))
+        elif self.incremental:
+            self.manifest = ConversionManifest(os.path.join(self.base_dir, '.cache', 'manifest.json'))
+        
+        # Collect every PDF up front so a worker pool can start on all of them at once
+        folder_files = self._job_folder_files() if self.job_file is not None else {}
+        for subdir in INPUT_SUBDIRS if self.job_file is None else ():
             subdir_path = os.path.join(self.input_dir, subdir)
             if not os.path.exists(subdir_path):
                 continue
@@ -624,178 +3332,576 @@ class SimplePDFConverter:
             if not pdf_files:
                 continue
             
-            print(f"\nProcessing {subdir.upper()} files...")
-            
-            if subdir == 'w2':
-                # Handle W2 files differently
-                all_w2_data = []
-                
-                for pdf_file in pdf_files:
-                    pdf_path = os.path.join(subdir_path, pdf_file)
-                    print(f"  - {pdf_file}")
-                    
+            folder_files[subdir] = [(f, os.path.join(subdir_path, f)) for f in pdf_files]
+        
+        # W-2s and invoice registers in other/ are merged into those folders' output
+        if 'other' in folder_files and self.job_file is None:
+            with self._run_stage('fingerprint'):
+                self._route_other_files(folder_files['other'])
+            for pdf_file, pdf_path in folder_files['other']:
+                doc_type = self._routes[pdf_file][0]
+                if doc_type in ('w2', 'invoice'):
+                    folder_files.setdefault(doc_type, []).append((f'other/{pdf_file}', pdf_path))
+            folder_files['other'] = [(pdf_file, pdf_path) for pdf_file, pdf_path in folder_files['other']
+                                     if self._routes[pdf_file][0] not in ('w2', 'invoice')]
+        
+        jobs = [(subdir, folder_files[subdir]) for subdir in INPUT_SUBDIRS if folder_files.get(subdir)]
+        if not jobs and self.job_file is None:
+            print(f"No PDF files found in the {', '.join(INPUT_SUBDIRS)} folders of {self.input_dir}")
+        
+        if self.dedup:
+            # A job's transactions are only checked against each other
+            index_dir = (os.path.join(self.output_dir, CHECKPOINTS_DIR) if self.job_file is not None
+                         else os.path.join(self.base_dir, '.cache'))
+            self.duplicate_index = DuplicateIndex(os.path.join(index_dir, 'duplicates.json'))
+        
+        total_files = sum(len(files) for _, files in jobs)
+        own_executor = None
+        if executor is None and self.workers > 1 and total_files > 1:
+            pool_size = min(self.workers, total_files)
+            from concurrent.futures import ProcessPoolExecutor
+            executor = own_executor = ProcessPoolExecutor(max_workers=pool_size)
+            print(f"Using {pool_size} worker processes")
+        
+        with own_executor or contextlib.nullcontext():
+            outcomes = self._start_jobs(jobs, executor)
+            if self.duplicate_index is not None:
+                kept_copies = set(self._kept_copies(jobs).values())
+                self.duplicate_index.reserve({self._manifest_key(pdf_path): self._document_hash(pdf_path)
+                                              for _, files in jobs for _, pdf_path in files
+                                              if self._manifest_key(pdf_path) in kept_copies})
+            for subdir, files in jobs:
+                self._write_subdir_output(subdir, files, outcomes)
+        
+        # Folders that are empty now have no current rows
+        if jobs or os.path.exists(self.ledger.path):
+            for subdir in set(INPUT_SUBDIRS) - {subdir for subdir, _ in jobs}:
+                self.ledger.set_current(subdir, [])
+        self.ledger.close()
+        
+        if self.manifest is not None:
+            removed = self.manifest.save()
+            if removed:
+                print(f"\nDropped rows from {removed} deleted or moved file(s)")
+        if self.duplicate_index is not None:
+            self.duplicate_index.save()
+            if self.run_counters['duplicate_files'] or self.run_counters['duplicate_rows']:
+                print(f"\nSkipped {self.run_counters['duplicate_files']} duplicate file(s) and dropped "
+                      f"{self.run_counters['duplicate_rows']} duplicate transaction(s); "
+                      f"see the DUPLICATES sections of the validation report")
+        
+        print("\nConversion complete!")
+        
+        if self.page_cache is not None:
+            self._print_hit_rate("Page cache", 'page_cache')
+        self._print_hit_rate("Merchant cache", 'merchant')
+        if self.run_counters['skipped_pages']:
+            print(f"Prefilter: skipped {self.run_counters['skipped_pages']} statement page(s) "
+                  f"with no dates or cardholder headers")
+        self.merchant_cache.save()
+        
+        if profiler is not None:
+            profiler.disable()
+        if self.profile:
+            self._write_profile_report(time.perf_counter() - started, profiler)
+        
+        # Check if validation report exists and has content
+        if os.path.exists(report_file):
+            print(f"\n⚠️  Validation Report created at: {report_file}")
+            print("Please review for any potential issues or missing data.")
+
+    def watch(self):
+        """Convert now, then again whenever a PDF in Convert/ is added, changed or removed.
+        
+        Runs until interrupted (Ctrl+C). The process, and with --workers its
+        pool of worker processes, stays up between passes, so nothing is
+        imported or started again. Changes that arrive while a pass runs
+        wait in a queue of up to WATCH_QUEUE_SIZE paths (the watcher blocks
+        when it's full) and are handled together by the next pass, once
+        none have arrived for WATCH_SETTLE_SECONDS, so a file that is still
+        being copied isn't read half-written. Passes are incremental: only
+        new and changed PDFs are parsed. A pass that fails (e.g. an output
+        workbook is open in Excel) is reported and watching goes on.
+        """
+        self.incremental = True
+        executor = self._start_watch_pool()
+        
+        changes = queue.Queue(maxsize=WATCH_QUEUE_SIZE)
+        stopping = threading.Event()
+        watcher, method = start_watcher(self.input_dir, changes, stopping)
+        try:
+            executor = self._watch_pass(executor)
+            while True:
+                print(f"\nWatching {self.input_dir} for PDFs ({method}). Press Ctrl+C to stop.")
+                changed = set()
+                while not changed:
                     try:
-                        w2_data = self.parse_w2_pdf(pdf_path)
-                        all_w2_data.extend(w2_data)
-                        print(f"    ✓ Extracted {len(w2_data)} W-2 forms")
-                    except Exception as e:
-                        print(f"    ✗ Error: {str(e)}")
-                
-                if all_w2_data:
-                    # Save W2 data with custom format
-                    df = pd.DataFrame(all_w2_data)
-                    df = df[['Employer Name', 'Employee Name', 'Gross Salary', 'Federal Tax', 
-                            'SSN', 'Medicare', 'State Witholds', 'SDI']]
-                    
-                    # Use fixed filename without timestamp
-                    output_file = os.path.join(self.output_dir, 'w2.xlsx')
-                    
-                    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                        df.to_excel(writer, sheet_name='W2_Data', index=False)
-                        
-                        worksheet = writer.sheets['W2_Data']
-                        # Set column widths for W2 format
-                        widths = [30, 30, 15, 15, 15, 15, 15, 15]
-                        for i, width in enumerate(widths):
-                            worksheet.column_dimensions[chr(65 + i)].width = width
-                        
-                        # Format currency columns
-                        for row in range(2, len(df) + 2):
-                            for col in ['C', 'D', 'F', 'G', 'H']:  # Salary and tax columns
-                                worksheet[f'{col}{row}'].number_format = '$#,##0.00'
-                    
-                    print(f"\n✅ Saved {len(df)} W-2 forms to: {output_file}")
+                        # Timeout so Ctrl+C is seen on Windows too
+                        changed.add(changes.get(timeout=WATCH_POLL_SECONDS))
+                    except queue.Empty:
+                        continue
+                while True:
+                    try:
+                        changed.add(changes.get(timeout=WATCH_SETTLE_SECONDS))
+                    except queue.Empty:
+                        break
+                print(f"\n{len(changed)} PDF(s) added, changed or removed")
+                executor = self._watch_pass(executor)
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        finally:
+            stopping.set()
+            watcher.stop()
+            watcher.join()
+            if executor is not None:
+                executor.shutdown()
+    
+    def _start_watch_pool(self):
+        """The pool of worker processes watch mode keeps between passes (None without --workers)."""
+        if self.workers <= 1:
+            return None
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        for future in [executor.submit(_warm_up_worker) for _ in range(self.workers)]:
+            future.result()
+        return executor
+    
+    def _watch_pass(self, executor):
+        """Run one conversion pass for watch(), returning the pool to use for the next one.
+        
+        An error ends the pass, not the watch. A worker process that dies
+        (e.g. killed, or out of memory) breaks the whole pool, so the pool is
+        then replaced and the pass run once more; the files it failed on
+        weren't recorded as converted.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+        for attempt in range(2):
+            try:
+                self.run(executor)
+            except BrokenProcessPool:
+                pass  # The pool was already broken when the pass started
+            except Exception as e:
+                print(f"\n❌ Conversion failed: {type(e).__name__}: {e}")
+                print("Fix the problem and save a PDF again to retry; still watching.")
+                if self.ledger is not None:
+                    self.ledger.close()
+                return executor
+            if executor is None or self._pool_alive(executor):
+                return executor
+            print("\n⚠️  A worker process stopped; restarting the workers")
+            executor.shutdown(wait=False)
+            executor = self._start_watch_pool()
+            if attempt == 0:
+                print("Converting again...")
+        return executor
+    
+    @staticmethod
+    def _pool_alive(executor):
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            executor.submit(_warm_up_worker).result()
+        except BrokenProcessPool:
+            return False
+        return True
+    
+    def _ledger_usable(self):
+        """Open an existing ledger (upgrading it if needed) before anything is written.
+        
+        A new ledger is only created once there are rows to store. Prints
+        why and returns False if the ledger can't be used.
+        """
+        if not os.path.exists(self.ledger.path):
+            return True
+        try:
+            self.ledger.connection
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return False
+        return True
+
+    def report(self):
+        """Rewrite the workbooks and data files from the ledger, without reading any PDF."""
+        print("\nPDF to Excel Converter (report only)")
+        print("=" * 50)
+        
+        ledger_file = os.path.join(self.output_dir, LEDGER_FILE)
+        if not os.path.exists(ledger_file):
+            print(f"No ledger at {ledger_file} yet; run the converter once without --report-only")
+            return
+        
+        self.ledger = Ledger(ledger_file)
+        if not self._ledger_usable():
+            return
+        for subdir in INPUT_SUBDIRS:
+            if not self.ledger.has_current(subdir):
+                continue
+            print(f"\nRebuilding {subdir.upper()} output from the ledger...")
+            with self._run_stage('read_ledger'):
+                tables = {table: self.ledger.rows(table, subdir) for table in self._output_tables(subdir, [])}
+            self._write_tables(subdir, tables)
+        self.ledger.close()
+        print("\nReport complete! (Validation_Report.txt is from the last conversion)")
+    
+    def check_text_backend(self, backend_name):
+        """Compare a text backend's page text with pdfplumber's on every PDF in Convert/.
+        
+        Prints each page that differs with its first differing line, and
+        returns the number of such pages. The page cache is not used.
+        """
+        reference = TEXT_BACKENDS[DEFAULT_TEXT_BACKEND]
+        backend = TEXT_BACKENDS[backend_name]
+        print(f"\nChecking the {backend.name} text backend against {reference.name}")
+        print("=" * 50)
+        
+        checked_pages = 0
+        mismatches = 0
+        for subdir in INPUT_SUBDIRS:
+            subdir_path = os.path.join(self.input_dir, subdir)
+            if not os.path.exists(subdir_path):
+                continue
+            for pdf_file in sorted(f for f in os.listdir(subdir_path) if f.lower().endswith('.pdf')):
+                try:
+                    with CachedPDF(os.path.join(subdir_path, pdf_file)) as doc:
+                        for page_num in range(len(doc.pdf.pages)):
+                            checked_pages += 1
+                            if not self._compare_page_text(doc, page_num, reference, backend, f"{subdir}/{pdf_file}"):
+                                mismatches += 1
+                except Exception as e:
+                    print(f"⚠️  Could not read {subdir}/{pdf_file}: {e}")
+        
+        if mismatches:
+            print(f"\n{mismatches} of {checked_pages} pages differ")
+        else:
+            print(f"✅ All {checked_pages} pages match")
+        return mismatches
+    
+    @staticmethod
+    def _compare_page_text(doc, page_num, reference, backend, label):
+        """Check one page's text from two backends, printing the first differing line."""
+        expected, actual = doc._read_page(page_num, lambda page: (reference.page_text(page), backend.page_text(page)))
+        if actual == expected:
+            return True
+        expected_lines, actual_lines = expected.split('\n'), actual.split('\n')
+        line_num = next((i for i, (a, b) in enumerate(zip(expected_lines, actual_lines)) if a != b),
+                        min(len(expected_lines), len(actual_lines)))
+        print(f"❌ {label} page {page_num + 1}, line {line_num + 1}:")
+        for name, lines in ((reference.name, expected_lines), (backend.name, actual_lines)):
+            print(f"    {name}: {lines[line_num] if line_num < len(lines) else '(end of page)'!r}")
+        return False
+
+    def _write_datasets(self, dataset, types, rows, label, partition_column=None):
+        """Save rows as Excel/<format>/<dataset> for each dataset format in --format."""
+        for output_format in self.formats:
+            if output_format == 'xlsx':
+                continue
+            dataset_dir = os.path.join(self.output_dir, output_format, dataset)
+            with self._run_stage(f'write_{output_format}', dataset_dir):
+                count = write_dataset(dataset_dir, types, rows, output_format, partition_column)
+            print(f"\n✅ Saved {count} {label} to: {dataset_dir}")
+
+    @contextlib.contextmanager
+    def _run_stage(self, name, output_file=None):
+        """Time a stage of run() itself, outside any one file, into the run counters."""
+        start = self._counters()
+        try:
+            with self.metrics.stage(name):
+                yield
+        finally:
+            self.run_counters.update(self._counters_since(start))
+            if output_file is not None and os.path.isfile(output_file):
+                self.run_counters['workbooks'] += 1
+                self.run_counters['bytes_written'] += os.path.getsize(output_file)
+            elif output_file is not None and os.path.isdir(output_file):
+                self.run_counters['datasets'] += 1
+                self.run_counters['bytes_written'] += sum(os.path.getsize(os.path.join(root, name))
+                                                          for root, _, names in os.walk(output_file)
+                                                          for name in names)
+    
+    def _write_profile_report(self, wall_seconds, profiler=None):
+        """Write Excel/profile.json and print a summary of where the run's time went."""
+        stages = {name[len('seconds.'):]: seconds for name, seconds in self.run_counters.items()
+                  if name.startswith('seconds.')}
+        counters = {name: value for name, value in self.run_counters.items() if not name.startswith('seconds.')}
+        files = [{
+            'file': file_key,
+            'parser': parser_name,
+            'seconds': round(sum(value for name, value in counters_delta.items() if name.startswith('seconds.')), 4),
+            'stages': {name[len('seconds.'):]: round(value, 4) for name, value in counters_delta.items()
+                       if name.startswith('seconds.') and value},
+            'pages': counters_delta.get('pages', 0),
+            'rows': counters_delta.get('rows', 0),
+            'validation_errors': counters_delta.get('validation_errors', 0),
+        } for file_key, parser_name, counters_delta in self.file_metrics]
+        
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(wall_seconds, 4),
+            'workers': self.workers,
+            'page_workers': self.page_workers,
+            'stages': {name: round(seconds, 4) for name, seconds in sorted(stages.items(), key=lambda item: -item[1])},
+            'counters': dict(sorted(counters.items())),
+            'files': sorted(files, key=lambda entry: -entry['seconds']),
+        }
+        
+        if profiler is not None:
+            import pstats
+            profiler.dump_stats(os.path.join(self.output_dir, 'profile.pstats'))
+            function_stats = pstats.Stats(profiler).stats
+            hottest = sorted(function_stats.items(), key=lambda item: -item[1][2])[:PROFILE_TOP_FUNCTIONS]
+            report['hot_functions'] = [{
+                'function': f"{os.path.basename(filename)}:{line}({name})",
+                'calls': calls,
+                'own_seconds': round(own_time, 4),
+                'cumulative_seconds': round(cumulative_time, 4),
+            } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in hottest]
+        
+        report_file = os.path.join(self.output_dir, 'profile.json')
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        
+        print(f"\nProfile ({wall_seconds:.2f}s wall time, {counters.get('files', 0)} files parsed):")
+        stage_total = sum(stages.values())
+        for name, seconds in report['stages'].items():
+            share = seconds / stage_total if stage_total else 0.0
+            print(f"  {name:<16} {seconds:>9.2f}s {share:>7.1%}")
+        if self.workers > 1 or self.page_workers > 1:
+            print("  (stage times are summed across worker processes)")
+        print(f"  {counters.get('pages', 0)} pages, {counters.get('lines', 0)} lines, "
+              f"{counters.get('rows', 0)} rows, {counters.get('validation_errors', 0)} validation errors, "
+              f"{counters.get('bytes_written', 0) / (1024 * 1024):.1f} MB written")
+        if files:
+            print("  Slowest files:")
+            for entry in report['files'][:5]:
+                print(f"    {entry['file']}: {entry['seconds']:.2f}s "
+                      f"({entry['pages']} pages, {entry['rows']} rows)")
+        if profiler is not None:
+            print("  Hottest functions (own time, this process only):")
+            for entry in report['hot_functions'][:10]:
+                print(f"    {entry['own_seconds']:>8.2f}s  {entry['function']}")
+        print(f"Profile written to: {report_file}")
+    
+    def _print_hit_rate(self, label, counter_prefix):
+        hits = self.run_counters[f'{counter_prefix}_hits']
+        misses = self.run_counters[f'{counter_prefix}_misses']
+        hit_rate = hits / (hits + misses) if hits + misses else 0.0
+        print(f"{label}: {hits} hits, {misses} misses ({hit_rate:.1%} hit rate)")
 
-            elif subdir == 'invoice':
-                # Handle invoice files
-                all_invoice_data = []
+    def _write_subdir_output(self, subdir, files, outcomes):
+        """Merge the parsed results for one input folder and save its workbook and data files."""
+        print(f"\nProcessing {subdir.upper()} files...")
+        
+        if subdir == 'w2':
+            results = self._collect_results(subdir, files, outcomes, 'W-2 forms')
+        elif subdir == 'invoice':
+            results = self._collect_results(subdir, files, outcomes, 'invoice registers')
+        else:
+            results = self._collect_results(subdir, files, outcomes, 'transactions', dedup_rows=True)
+        
+        if self.ledger is not None:
+            # Written from the ledger, exactly as --report-only rebuilds them
+            with self._run_stage('read_ledger'):
+                tables = {table: self.ledger.rows(table, subdir) for table in self._output_tables(subdir, [])}
+        else:
+            tables = self._output_tables(subdir, results)
+        self._write_tables(subdir, tables)
+    
+    @staticmethod
+    def _output_tables(subdir, results):
+        """Split a folder's (or one file's) parsed results into the rows of each output table."""
+        if subdir == 'w2':
+            return {'w2': results}
+        if subdir == 'invoice':
+            # Summary sheet - one row per register
+            summary_rows = [{
+                'Register ID': invoice['Invoice Number'],
+                'Business Date': invoice['Invoice Date'],
+                'Company': invoice['Vendor Name'],
+                'Print Date': invoice.get('Print Date', ''),
+                'Total Invoices': invoice['Line Items Count'],
+                'Total Amount': invoice['Total Amount'],
+                'Subtotal': invoice['Subtotal']
+            } for invoice in results]
+            
+            # Individual invoices sheet
+            line_rows = [line_item for invoice in results for line_item in invoice['Line Items']]
+            return {'invoice_registers': summary_rows, 'invoice_lines': line_rows}
+        return {'transactions': results}
+    
+    def _write_tables(self, subdir, tables):
+        """Save one folder's output tables (see _output_tables) as its workbook and data files."""
+        if subdir == 'w2':
+            # Handle W2 files differently
+            all_w2_data = tables['w2']
+            
+            if all_w2_data and 'xlsx' in self.formats:
+                # Use fixed filename without timestamp
+                output_file = os.path.join(self.output_dir, 'w2.xlsx')
                 
-                for pdf_file in pdf_files:
-                    pdf_path = os.path.join(subdir_path, pdf_file)
-                    print(f"  - {pdf_file}")
-                    
-                    try:
-                        invoice_data = self.parse_invoice_pdf(pdf_path)
-                        all_invoice_data.extend(invoice_data)
-                        print(f"    ✓ Extracted {len(invoice_data)} invoice registers")
-                    except Exception as e:
-                        print(f"    ✗ Error: {str(e)}")
+                with self._run_stage('write_xlsx', output_file), StreamingXlsxWriter(output_file) as writer:
+                    # Salary and tax columns are currency
+                    count = writer.write_sheet('W2_Data', W2_COLUMNS, all_w2_data,
+                                               widths=[30, 30, 15, 15, 15, 15, 15, 15],
+                                               currency_columns=['Gross Salary', 'Federal Tax', 'Medicare',
+                                                                 'State Witholds', 'SDI'])
                 
-                if all_invoice_data:
+                print(f"\n✅ Saved {count} W-2 forms to: {output_file}")
+            if all_w2_data:
+                self._write_datasets('w2', W2_TYPES, all_w2_data, 'W-2 forms')
+
+        elif subdir == 'invoice':
+            # Handle invoice files
+            summary_rows = tables['invoice_registers']
+            line_rows = tables['invoice_lines']
+            
+            if summary_rows:
+                if 'xlsx' in self.formats:
                     # Save to Excel with multiple sheets
                     output_file = os.path.join(self.output_dir, 'invoice.xlsx')
                     
-                    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                        # Summary sheet - one row per register
-                        summary_data = []
-                        for invoice in all_invoice_data:
-                            summary_row = {
-                                'Register ID': invoice['Invoice Number'],
-                                'Business Date': invoice['Invoice Date'],
-                                'Company': invoice['Vendor Name'],
-                                'Print Date': invoice.get('Print Date', ''),
-                                'Total Invoices': invoice['Line Items Count'],
-                                'Total Amount': invoice['Total Amount'],
-                                'Subtotal': invoice['Subtotal']
-                            }
-                            summary_data.append(summary_row)
-                        
-                        if summary_data:
-                            df_summary = pd.DataFrame(summary_data)
-                            df_summary.to_excel(writer, sheet_name='Register_Summary', index=False)
-                            
-                            worksheet = writer.sheets['Register_Summary']
-                            # Set column widths
-                            widths = [20, 15, 20, 15, 12, 15, 15]
-                            for i, width in enumerate(widths):
-                                if i < len(df_summary.columns):
-                                    worksheet.column_dimensions[chr(65 + i)].width = width
-                            
-                            # Format currency columns
-                            for row in range(2, len(df_summary) + 2):
-                                for col in ['F', 'G']:  # Total Amount, Subtotal columns
-                                    worksheet[f'{col}{row}'].number_format = '$#,##0.00'
-                        
-                        # Individual invoices sheet
-                        all_lines = []
-                        for invoice in all_invoice_data:
-                            for line_item in invoice['Line Items']:
-                                all_lines.append(line_item)
-                        
-                        if all_lines:
-                            df_lines = pd.DataFrame(all_lines)
-                            # Reorder columns for better readability
-                            column_order = ['Invoice Number', 'Customer Name', 'Customer ID', 
-                                        'Product Amount', 'Misc Charges', 'Subtotal', 'Total Amount',
-                                        'Business Date', 'Print Date']
-                            df_lines = df_lines[column_order]
-                            
-                            df_lines.to_excel(writer, sheet_name='Individual_Invoices', index=False)
-                            
-                            worksheet = writer.sheets['Individual_Invoices']
-                            # Set column widths
-                            widths = [12, 30, 12, 15, 12, 15, 15, 12, 12]
-                            for i, width in enumerate(widths):
-                                if i < len(df_lines.columns):
-                                    worksheet.column_dimensions[chr(65 + i)].width = width
-                            
-                            # Format currency columns
-                            for row in range(2, len(df_lines) + 2):
-                                for col in ['D', 'E', 'F', 'G']:  # Amount columns
-                                    worksheet[f'{col}{row}'].number_format = '$#,##0.00'
+                    with self._run_stage('write_xlsx', output_file), StreamingXlsxWriter(output_file) as writer:
+                        summary_count = writer.write_sheet('Register_Summary', INVOICE_SUMMARY_COLUMNS, summary_rows,
+                                                           widths=[20, 15, 20, 15, 12, 15, 15],
+                                                           currency_columns=['Total Amount', 'Subtotal'])
+                        line_count = writer.write_sheet('Individual_Invoices', INVOICE_LINE_COLUMNS, line_rows,
+                                                        widths=[12, 30, 12, 15, 12, 15, 15, 12, 12],
+                                                        currency_columns=['Product Amount', 'Misc Charges',
+                                                                          'Subtotal', 'Total Amount'])
                     
                     print(f"\n✅ Saved invoice register to: {output_file}")
-                    print(f"    - Register summary: {len(summary_data)} registers")
-                    print(f"    - Individual invoices: {len(all_lines)} invoice lines")
-            else:
-                # Handle regular transaction files
-                all_transactions = []
+                    print(f"    - Register summary: {summary_count} registers")
+                    print(f"    - Individual invoices: {line_count} invoice lines")
                 
-                for pdf_file in pdf_files:
-                    pdf_path = os.path.join(subdir_path, pdf_file)
-                    print(f"  - {pdf_file}")
-                    
-                    try:
-                        if subdir == 'amex' or (subdir == 'other' and 'amex' in pdf_file.lower()):
-                            transactions = self.parse_amex_pdf(pdf_path)
-                        elif subdir == 'chase' or (subdir == 'other' and 'chase' in pdf_file.lower()):
-                            transactions = self.parse_chase_pdf(pdf_path)
-                        else:
-                            transactions = self.parse_amex_pdf(pdf_path)  # Default
-                        
-                        all_transactions.extend(transactions)
-                        print(f"    ✓ Extracted {len(transactions)} transactions")
-                    except Exception as e:
-                        print(f"    ✗ Error: {str(e)}")
+                self._write_datasets('invoice_summary', INVOICE_SUMMARY_TYPES, summary_rows, 'registers',
+                                     partition_column='Business Date')
+                self._write_datasets('invoice_lines', INVOICE_LINE_TYPES, line_rows, 'invoice lines',
+                                     partition_column='Business Date')
+        else:
+            # Handle regular transaction files
+            all_transactions = tables['transactions']
+            
+            if all_transactions:
+                # Sort by cardholder, then date (stable, so ties keep PDF order)
+                all_transactions.sort(key=lambda row: (row['Name'], row['Date']))
                 
-                if all_transactions:
-                    # Save to Excel
-                    df = pd.DataFrame(all_transactions)
-                    df = df[['Name', 'Date', 'Merchant', 'Amount']]
-                    df = df.sort_values(['Name', 'Date'])
-                    
+                if 'xlsx' in self.formats:
                     # Use fixed filename without timestamp
                     output_file = os.path.join(self.output_dir, f'{subdir}.xlsx')
                     
-                    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-                        df.to_excel(writer, sheet_name='Transactions', index=False)
-                        
-                        worksheet = writer.sheets['Transactions']
-                        for col in ['A', 'B', 'C', 'D']:
-                            worksheet.column_dimensions[col].width = [25, 12, 50, 12][ord(col) - 65]
-                        
-                        for row in range(2, len(df) + 2):
-                            worksheet[f'D{row}'].number_format = '$#,##0.00'
+                    with self._run_stage('write_xlsx', output_file), StreamingXlsxWriter(output_file) as writer:
+                        count = writer.write_sheet('Transactions', TRANSACTION_COLUMNS, all_transactions,
+                                                   widths=[25, 12, 50, 12], currency_columns=['Amount'])
                     
-                    print(f"\n✅ Saved {len(df)} transactions to: {output_file}")
-        
-        print("\nConversion complete!")
-        
-        # Check if validation report exists and has content
-        if os.path.exists(report_file):
-            print(f"\n⚠️  Validation Report created at: {report_file}")
-            print("Please review for any potential issues or missing data.")
+                    print(f"\n✅ Saved {count} transactions to: {output_file}")
+                
+                # Each statement folder is the type=<folder> partition of one transactions dataset
+                self._write_datasets(os.path.join('transactions', f'type={subdir}'), TRANSACTION_TYPES,
+                                     all_transactions, 'transactions', partition_column='Date')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert the PDFs in Convert/ to Excel workbooks in Excel/.")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="parse PDFs in N worker processes (0 = one per CPU, default: 1)")
+    parser.add_argument('--page-workers', type=int, default=1, metavar='N',
+                        help="split the pages of large AmEx/Chase statements and invoice registers, "
+                             "and the OCR of scanned invoice pages, across N processes "
+                             "(0 = one per CPU, default: 1)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only parse PDFs that are new or changed since the last --incremental run")
+    parser.add_argument('--w2-mode', choices=W2_MODES, default='text',
+                        help="read W-2 boxes from the extracted text lines (default) or from the "
+                             "word positions of the page layout")
+    parser.add_argument('--text-backend', action='append', default=[], metavar='[TYPE=]NAME',
+                        help=f"how page text is extracted: {', '.join(TEXT_BACKENDS)} "
+                             f"(default: {DEFAULT_TEXT_BACKEND}); prefix a document type "
+                             f"({', '.join(DOCUMENT_TYPES)}) to set it for that type only. Repeatable")
+    parser.add_argument('--check-text-backend', choices=TEXT_BACKENDS, metavar='NAME',
+                        help="compare NAME's page text with pdfplumber's for every PDF in Convert/ "
+                             "and exit (status 1 if any page differs)")
+    parser.add_argument('--vectorized', action='store_true',
+                        help="parse the dates, amounts and merchants of AmEx/Chase statement lines in "
+                             "batches with pandas instead of line by line (same output)")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="don't skip copies of the same PDF or drop transactions that another "
+                             "statement already listed")
+    parser.add_argument('--watch', action='store_true',
+                        help="keep running: convert again (incrementally) whenever a PDF in Convert/ "
+                             "is added, changed or removed, until Ctrl+C")
+    parser.add_argument('--job', metavar='FILE',
+                        help="convert the PDFs listed in FILE (paths or glob patterns, one per line) "
+                             "instead of Convert/, as a resumable batch: each parsed PDF is "
+                             f"checkpointed under Excel/{JOBS_DIR}/<job name>/, and running the job "
+                             "again after a crash only parses the rest")
+    parser.add_argument('--report-only', action='store_true',
+                        help=f"rewrite the workbooks and data files from Excel/{LEDGER_FILE} "
+                             "without reading any PDF")
+    parser.add_argument('--format', default='xlsx', metavar='FMT[,FMT...]',
+                        help=f"output formats, comma-separated: {', '.join(OUTPUT_FORMATS)} "
+                             "(default: xlsx). csv, parquet and arrow write typed datasets "
+                             "partitioned by document type and month under Excel/<format>/")
+    parser.add_argument('--profile', action='store_true',
+                        help="time each stage and file, and write Excel/profile.json with a summary")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="like --profile, and also list the hottest functions using cProfile "
+                             "(main process only; saves Excel/profile.pstats)")
+    parser.add_argument('--no-prefilter', action='store_true',
+                        help="lay out the text of every statement page, including pages with no "
+                             "dates or cardholder headers (terms, notices)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="don't read or write the extracted page text cache in .cache/")
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB, metavar='MB',
+                        help=f"size cap for the page text cache (default: {DEFAULT_CACHE_MB})")
+    args = parser.parse_args(argv)
+    if args.workers < 0:
+        parser.error("--workers must be 0 or greater")
+    if args.page_workers < 0:
+        parser.error("--page-workers must be 0 or greater")
+    if args.cache_mb <= 0:
+        parser.error("--cache-mb must be greater than 0")
+    if args.watch and args.report_only:
+        parser.error("--watch and --report-only can't be used together")
+    if args.job is not None and args.watch:
+        parser.error("--job and --watch can't be used together")
+    if args.job is not None and not os.path.isfile(args.job):
+        parser.error(f"job file not found: {args.job}")
+    text_backends = {}
+    for value in args.text_backend:
+        doc_type, _, backend_name = value.rpartition('=')
+        if backend_name not in TEXT_BACKENDS:
+            parser.error(f"unknown text backend {backend_name!r} (choose from {', '.join(TEXT_BACKENDS)})")
+        if doc_type and doc_type not in DOCUMENT_TYPES:
+            parser.error(f"unknown document type {doc_type!r} (choose from {', '.join(DOCUMENT_TYPES)})")
+        text_backends.update({doc_type: backend_name} if doc_type else dict.fromkeys(DOCUMENT_TYPES, backend_name))
+    formats = [output_format.strip().lower() for output_format in args.format.split(',') if output_format.strip()]
+    unknown = [output_format for output_format in formats if output_format not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        parser.error(f"--format must be one or more of {', '.join(OUTPUT_FORMATS)}")
+    if {'parquet', 'arrow'} & set(formats):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet/arrow needs pyarrow (pip install pyarrow)")
+
+    converter = SimplePDFConverter(workers=args.workers, page_workers=args.page_workers,
+                                   use_cache=not args.no_cache, cache_mb=args.cache_mb,
+                                   incremental=args.incremental, w2_mode=args.w2_mode,
+                                   text_backends=text_backends, formats=list(dict.fromkeys(formats)),
+                                   vectorized=args.vectorized, dedup=not args.keep_duplicates,
+                                   prefilter=not args.no_prefilter, profile=args.profile, cprofile=args.cprofile)
+    if args.check_text_backend:
+        sys.exit(1 if converter.check_text_backend(args.check_text_backend) else 0)
+    if args.job is not None:
+        converter.use_job(args.job)
+    if args.report_only:
+        converter.report()
+    elif args.watch:
+        converter.watch()
+    else:
+        converter.run()
 
 if __name__ == "__main__":
-    converter = SimplePDFConverter()
-    converter.run()
\ No newline at end of file
+    # Required for process pools in the frozen (PyInstaller) executable
+    if getattr(sys, 'frozen', False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    main()
\ No newline at end of file